@@ -0,0 +1,44 @@
+from typing import Any
+
+from thriftease_api.gql import Schema
+from utils.gql import GqlAction, GqlArgument, GqlType
+
+
+class AccountSchema(Schema):
+    AccountType = GqlType("id", "name", "balance", "future_balance")
+    AccountPayload = GqlType(data=AccountType, errors=Schema.ErrorType)
+    PageType = GqlType("previous", "current", "next")
+    PaginatorType = GqlType(
+        "per_page", "items", "pages", "after", "before", page=PageType
+    )
+    CursorPaginatorType = GqlType("per_page", "after", "before")
+    ListAccountsPayload = GqlType(
+        data=AccountType, paginator=PaginatorType, cursor=CursorPaginatorType
+    )
+    GetAccountPayload = GqlType(data=AccountType)
+
+    @classmethod
+    def getAccount(cls, id: Any):
+        act = GqlAction(
+            "getAccount",
+            GqlArgument(input=GqlArgument(id=id)),
+            cls.GetAccountPayload,
+        )
+        return act
+
+    @classmethod
+    def listAccounts(cls, **kwargs):
+        act = GqlAction(
+            "listAccounts",
+            GqlArgument(**kwargs),
+            cls.ListAccountsPayload,
+        )
+        return act
+
+    @classmethod
+    def accountBalanceAsOf(cls, account: Any, datetime: str):
+        act = GqlAction(
+            "accountBalanceAsOf",
+            GqlArgument(account=account, datetime=datetime),
+        )
+        return act
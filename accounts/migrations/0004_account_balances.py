@@ -0,0 +1,52 @@
+# Generated by Django 5.0 on 2026-10-18 18:18
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_balances(apps, schema_editor):
+    Account = apps.get_model('accounts', 'Account')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    def get_balance(**filters):
+        return Coalesce(
+            Transaction.objects.filter(account_id=OuterRef('pk'), **filters)
+            .order_by()
+            .values('account_id')
+            .annotate(total=Sum('amount'))
+            .values('total'),
+            Decimal('0'),
+            output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        )
+
+    Account.objects.update(
+        balance=get_balance(scheduled=False), future_balance=get_balance()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_account_unique_together'),
+        ('transactions', '0004_transaction_scheduled'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='account',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='future_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=18),
+        ),
+        migrations.RunPython(fill_balances, migrations.RunPython.noop),
+    ]
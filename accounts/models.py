@@ -1,35 +1,35 @@
 from decimal import Decimal
+from typing import Any
 
 from django.db import models
-from django.db.models import F, OuterRef
+from django.db.models import OuterRef, Sum
 from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
-from django.utils import timezone
 
 from currencies.models import Currency
 from transactions.models import Transaction
 
 
 class AccountManager(models.Manager):
-    def get_queryset(self):
-        qs: QuerySet["Account"] = super().get_queryset()  # type: ignore
-        ts = Transaction.objects  # type: ignore
-        fields = dict(
-            balance=Coalesce(
-                ts.values("new_account_balance")
-                .filter(account_id=OuterRef("pk"), datetime__lte=timezone.now())
-                .order_by("-datetime", "-id")[:1],
-                Decimal("0"),
-            ),
-            future_balance=Coalesce(
-                ts.values("new_account_balance")
-                .filter(account_id=OuterRef("pk"))
-                .order_by("-datetime", "-id")[:1],
-                Decimal("0"),
-            ),
+    @classmethod
+    def get_balance(cls, **filters):
+        # plain SUM(amount) of the account's transactions, no running balances
+        return Coalesce(
+            Transaction._base_manager.filter(account_id=OuterRef("pk"), **filters)
+            .order_by()
+            .values("account_id")
+            .annotate(total=Sum("amount"))
+            .values("total"),
+            Decimal("0"),
+            output_field=models.DecimalField(max_digits=18, decimal_places=2),
+        )
+
+    def refresh_balances(self, *pks: Any):
+        # recomputes the stored balances from the account's transactions
+        return self.filter(pk__in=pks).update(
+            balance=self.get_balance(scheduled=False),
+            future_balance=self.get_balance(),
         )
-        qs = qs.alias(**fields).annotate(**{k: F(k) for k in fields})
-        return qs
 
 
 class Account(models.Model):
@@ -37,28 +37,17 @@ class Account(models.Model):
 
     currency = models.ForeignKey(Currency, models.CASCADE, default=None)
     name = models.CharField(max_length=50, default="")
+    # maintained on transaction save/delete and by the maturation worker,
+    # scheduled transactions only count towards the future balance
+    balance = models.DecimalField(
+        editable=False, max_digits=18, decimal_places=2, default=Decimal(0)
+    )
+    future_balance = models.DecimalField(
+        editable=False, max_digits=18, decimal_places=2, default=Decimal(0)
+    )
 
     transaction_set: QuerySet[Transaction]
 
     class Meta:
         base_manager_name = "objects"
         unique_together = (("currency", "name"),)
-
-    balance = Decimal("0")
-    future_balance = Decimal("0")
-
-    # def get_balance(self, **filters):
-    #     transaction = (
-    #         self.transaction_set.filter(**filters).order_by("datetime", "id").last()
-    #     )
-    #     if transaction:
-    #         return transaction.new_account_balance
-    #     return Decimal("0.00")
-
-    # @property
-    # def balance(self):
-    #     return self.get_balance(datetime__lte=timezone.now())
-
-    # @property
-    # def future_balance(self):
-    #     return self.get_balance()
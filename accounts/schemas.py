@@ -3,6 +3,7 @@ from typing import Any
 from graphene import (
     ID,
     Boolean,
+    DateTime,
     Decimal,
     Field,
     InputObjectType,
@@ -23,10 +24,12 @@ from accounts.forms import (
 )
 from accounts.models import Account
 from currencies.models import Currency
+from transactions.models import BalanceCheckpoint
 from utils import filter_order_paginate
 from utils.filter import filter_to_filter_input_class
 from utils.order import form_to_order_argument
 from utils.paginator import PaginatorQueryInput, PaginatorQueryPayload
+from utils.planner import plan
 
 
 class AccountType(DjangoObjectType):
@@ -76,11 +79,14 @@ class AccountQuery(ObjectType):
     account_existing = Field(
         Boolean, currency=ID(required=True), name=String(required=True)
     )
+    account_balance_as_of = Field(
+        Decimal, account=ID(required=True), datetime=DateTime(required=True)
+    )
 
     @staticmethod
     @login_required
     def resolve_get_account(root, info, input: GetAccountQueryInput):
-        data = Account._default_manager.get(
+        data = plan(Account._default_manager.all(), info).get(
             pk=input.id, currency__user=info.context.user
         )
         return GetAccountQueryPayload(data=data)  # type: ignore
@@ -95,20 +101,28 @@ class AccountQuery(ObjectType):
         paginator: PaginatorQueryInput | None = None,
     ):
         data = Account._default_manager.filter(currency__user=info.context.user)
-        data, kwargs = filter_order_paginate(data, filter, order, paginator)
+        data, kwargs = filter_order_paginate(data, filter, order, paginator, info)
         return ListAccountsQueryPayload(data=data, **kwargs)  # type: ignore
 
     @staticmethod
     @login_required
     def resolve_account_existing(root, info, currency: int, name: str):
         try:
-            Account._default_manager.get(
+            Account._base_manager.only("pk").get(
                 currency=currency, name=name, currency__user=info.context.user
             )
             return True
         except Exception:
             return False
 
+    @staticmethod
+    @login_required
+    def resolve_account_balance_as_of(root, info, account: int, datetime: Any):
+        data = Account._base_manager.only("pk").get(
+            pk=account, currency__user=info.context.user
+        )
+        return BalanceCheckpoint.objects.get_balance(data.pk, datetime)
+
 
 # mutations
 class BaseAccountMutation(DjangoModelFormMutation):
@@ -143,7 +157,9 @@ class ExistingAccountMutation(BaseAccountMutation):
     @classmethod
     def get_form_kwargs(cls, root, info, **input):
         kwargs = super().get_form_kwargs(root, info, **input)
-        cls._meta.model._default_manager.filter(currency__user=info.context.user).get(
+        cls._meta.model._base_manager.only("pk").filter(
+            currency__user=info.context.user
+        ).get(
             pk=kwargs["instance"].pk  # type: ignore
         )
         return kwargs
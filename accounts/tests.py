@@ -1,3 +1,62 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.gql import AccountSchema
+from authentication.tests import TestAuth
+from thriftease_api.tests import TestGraphQL
+from transactions.models import Transaction
+from transactions.tests import create_ledger, props
+
+
+class TestAccountQuery(TestGraphQL, AccountSchema):
+    def test_account_balance_as_of(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days, amount in ((90, "100"), (60, "-40"), (30, "15")):
+            Transaction(
+                account=account, amount=Decimal(amount), datetime=now - timedelta(days)
+            ).save()
+
+        response = gql(
+            self.query(
+                self.accountBalanceAsOf(
+                    account.pk, (now - timedelta(days=45)).isoformat()
+                )
+            ).render(),
+            headers=headers,
+        )
+        content = json.loads(response.content)
+        assert Decimal(content["data"]["accountBalanceAsOf"]) == Decimal("60")
+
+    def test_list_accounts_balances(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days, amount in ((2, "100.10"), (1, "-40.20"), (-1, "15.30")):
+            Transaction(
+                account=account, amount=Decimal(amount), datetime=now - timedelta(days)
+            ).save()
+
+        response = gql(self.query(self.listAccounts()).render(), headers=headers)
+        content = json.loads(response.content)
+        data = content["data"]["listAccounts"]["data"]
+        assert Decimal(data[0]["balance"]) == Decimal("59.90")
+        assert Decimal(data[0]["futureBalance"]) == Decimal("75.20")
+
+    def test_query_plan(self, gql: Any):
+        for name in ("Wallet", "Bank", "Savings"):
+            create_ledger(name=name)
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+
+        with CaptureQueriesContext(connection) as context:
+            gql(self.query(self.listAccounts()).render(), headers=headers)
+        assert not self.full_scans(
+            context.captured_queries, "accounts_account", "currencies_currency"
+        )
@@ -0,0 +1,56 @@
+# ad hoc performance benchmarks, run each module with `python -m benchmarks.<name>`
+# they work on a throwaway test database so the development database is untouched
+import os
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from statistics import median
+from typing import Any
+
+
+@contextmanager
+def database():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "thriftease_api.settings")
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+        teardown_test_environment()
+
+
+def timings(func: Callable[[], Any], repeat: int = 5):
+    # wall times in milliseconds, after one warm up run
+    func()
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        result.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def timeit(func: Callable[[], Any], repeat: int = 5):
+    # median wall time in milliseconds
+    return median(timings(func, repeat))
+
+
+def execute(user: Any, query: str, variables: dict[str, Any] | None = None):
+    from django.test import RequestFactory
+
+    from thriftease_api.schemas import schema
+
+    request = RequestFactory().post("/graphql")
+    request.user = user
+    result = schema.execute(query, context_value=request, variables=variables)
+    if result.errors:
+        raise result.errors[0]
+    return result.data
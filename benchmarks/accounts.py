@@ -0,0 +1,73 @@
+# listAccounts latency against the total transaction volume, comparing the
+# previous nested running balance lookups with the current account balances
+import argparse
+from decimal import Decimal
+from unittest import mock
+
+from benchmarks import database, execute, timeit
+
+
+def legacy_get_queryset(self):
+    # AccountManager.get_queryset before the balances became plain aggregates,
+    # a running balance subquery nested inside a per-account subquery, under
+    # other names since the balances are stored columns now
+    from django.db import models
+    from django.db.models import F, OuterRef
+    from django.db.models.functions import Coalesce
+    from django.utils import timezone
+
+    from transactions.models import Transaction
+
+    ts = Transaction.objects.with_subquery_balances()
+    fields = dict(
+        legacy_balance=Coalesce(
+            ts.values("computed_new_account_balance")
+            .filter(account_id=OuterRef("pk"), datetime__lte=timezone.now())
+            .order_by("-datetime", "-id")[:1],
+            Decimal("0"),
+        ),
+        legacy_future_balance=Coalesce(
+            ts.values("computed_new_account_balance")
+            .filter(account_id=OuterRef("pk"))
+            .order_by("-datetime", "-id")[:1],
+            Decimal("0"),
+        ),
+    )
+    qs = models.Manager.get_queryset(self)
+    return qs.alias(**fields).annotate(**{k: F(k) for k in fields})
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="listAccounts latency against transaction volume"
+    )
+    parser.add_argument("--volumes", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with database():
+        from django.db import transaction
+
+        from accounts.gql import AccountSchema
+        from accounts.models import AccountManager
+        from benchmarks.generator import generate_ledger
+        from utils.gql import GqlArgument
+
+        query = AccountSchema.query(
+            AccountSchema.listAccounts(paginator=GqlArgument(per_page=10))
+        ).render()
+        print(f"{'transactions':>12} {'before (ms)':>12} {'after (ms)':>12}")
+        for volume in args.volumes:
+            with transaction.atomic():
+                user = generate_ledger(volume, email=f"bench{volume}@email.com")
+                with mock.patch.object(
+                    AccountManager, "get_queryset", legacy_get_queryset
+                ):
+                    before = timeit(lambda: execute(user, query), args.repeat)
+                after = timeit(lambda: execute(user, query), args.repeat)
+                transaction.set_rollback(True)
+            print(f"{volume:>12} {before:>12.1f} {after:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
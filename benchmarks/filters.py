@@ -0,0 +1,54 @@
+# listTransactions latency of the filters the OrFilterSet compiles into native
+# predicates, comparing them with the plain lookups they replace
+import argparse
+from unittest import mock
+
+from benchmarks import database, execute, timeit
+
+FILTERS = dict(
+    scheduled=dict(scheduled=True),
+    operation=dict(operation="DEBIT"),
+    id=dict(id__icontains="4242"),
+    account=dict(account__id__icontains="3"),
+    amount=dict(amount__icontains="1234.5"),
+    month=dict(datetime__month=3),
+    day=dict(datetime__day=15),
+    hour=dict(datetime__hour=6),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="listTransactions filter latency on a large ledger"
+    )
+    parser.add_argument("--volume", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with database():
+        from django.db import transaction
+
+        from benchmarks.generator import generate_ledger
+        from transactions.filters import TransactionFilter
+        from transactions.gql import TransactionSchema
+        from utils.gql import GqlArgument
+
+        print(f"{'filter':>12} {'before (ms)':>12} {'after (ms)':>12}")
+        with transaction.atomic():
+            user = generate_ledger(args.volume)
+            for name, filter in FILTERS.items():
+                query = TransactionSchema.query(
+                    TransactionSchema.listTransactions(
+                        filter=GqlArgument(**filter),
+                        paginator=GqlArgument(per_page=10),
+                    )
+                ).render()
+                with mock.patch.object(TransactionFilter, "rewrites", {}):
+                    before = timeit(lambda: execute(user, query), args.repeat)
+                after = timeit(lambda: execute(user, query), args.repeat)
+                print(f"{name:>12} {before:>12.1f} {after:>12.1f}")
+            transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
+
+from django.utils import timezone
+
+# the names and description words of the generated rows
+NAMES = ("Groceries", "Rent", "Salary", "Coffee", "Electricity", "Internet", "Fare")
+WORDS = ("market", "monthly", "weekly", "office", "home", "card", "cash", "refund")
+
+
+def generate_ledger(
+    transactions: int, accounts: int = 10, seed: int = 0, email: str = "bench@email.com"
+):
+    # one user with a single currency and the transactions spread randomly over
+    # the accounts and the past two years, written with bulk_create
+    from accounts.models import Account
+    from currencies.models import Currency
+    from transactions.models import Transaction
+    from users.models import User
+
+    rng = random.Random(seed)
+    user = User.objects.create_user(email, "Bench", "User", "@Password1234")
+    currency = Currency.objects.create(
+        user=user, abbreviation="php", symbol="P", name="Peso"
+    )
+    rows = Account.objects.bulk_create(
+        [Account(currency=currency, name=f"Account {i}") for i in range(accounts)]
+    )
+    now = timezone.now()
+    batch: list[Any] = []
+    for _ in range(transactions):
+        datetime = now - timedelta(seconds=rng.randint(-86400 * 30, 86400 * 730))
+        row = Transaction(
+            account=rng.choice(rows),
+            amount=Decimal(rng.randint(-500000, 500000)) / 100,
+            datetime=datetime,
+            scheduled=datetime > now,
+            name=rng.choice(NAMES),
+            description=" ".join(rng.sample(WORDS, 3)),
+        )
+        row.set_local_parts()
+        batch.append(row)
+        if len(batch) >= 5000:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    Transaction.objects.bulk_create(batch)
+    for account in rows:
+        Transaction.objects.rebalance(account.pk)
+    return user
+
+
+CURRENCIES = (("php", "P", "Peso"), ("usd", "$", "US Dollar"), ("jpy", "Y", "Yen"))
+ACCOUNTS = ("Cash", "Savings", "Checking", "Credit Card", "E-Wallet")
+TAGS = ("food", "bills", "transport", "leisure", "health", "work", "family", "travel")
+BILLS = ("Rent", "Electricity", "Internet")
+SPENDING = ("Groceries", "Coffee", "Fare")
+
+
+def ledger_row(rng: random.Random, account: Any, now: Any):
+    # mostly small purchases during the day with a long tail of large ones,
+    # the salary on the 15th and the end of the month and the monthly bills,
+    # over the past two years and the next month (scheduled)
+    from transactions.models import Transaction
+
+    local = timezone.localtime(now - timedelta(days=rng.randint(-30, 730)))
+    kind = rng.choices(("spending", "salary", "bill"), (90, 5, 5))[0]
+    if kind == "salary":
+        local = local.replace(day=15 if local.day <= 15 else 28, hour=9, minute=0)
+        amount = Decimal(rng.randint(20000, 60000))
+        name = "Salary"
+    elif kind == "bill":
+        local = local.replace(day=rng.randint(1, 5), hour=rng.randint(8, 20))
+        amount = -Decimal(rng.randint(1500, 15000))
+        name = rng.choice(BILLS)
+    else:
+        local = local.replace(
+            hour=int(rng.triangular(7, 22, 13)), minute=rng.randint(0, 59)
+        )
+        amount = -Decimal(f"{rng.lognormvariate(5.5, 1):.2f}")
+        name = rng.choice(SPENDING)
+    row = Transaction(
+        account=account,
+        amount=amount,
+        datetime=local,
+        scheduled=local > now,
+        name=name,
+        description=" ".join(rng.sample(WORDS, 3)),
+    )
+    row.set_local_parts()
+    return row
+
+
+def generate_users(users: int, transactions: int, seed: int = 0):
+    # users with one or two currencies, a few accounts each and their tags,
+    # sharing the transactions unevenly (a few heavy users) with most of
+    # them on their first account, zero to two tags per transaction, all
+    # written with bulk_create. Returns the users, the heaviest first.
+    from accounts.models import Account
+    from currencies.models import Currency
+    from tags.models import Tag
+    from transactions.models import Transaction
+    from users.models import User
+
+    rng = random.Random(seed)
+    rows = [
+        User(email=f"bench{i}@email.com", given_name="Bench", family_name=f"User {i}")
+        for i in range(users)
+    ]
+    for user in rows:
+        user.set_unusable_password()
+    rows = User.objects.bulk_create(rows)
+    currencies = Currency.objects.bulk_create(
+        [
+            Currency(user=user, abbreviation=a, symbol=s, name=n)
+            for user in rows
+            for a, s, n in CURRENCIES[: rng.randint(1, 2)]
+        ]
+    )
+    accounts = Account.objects.bulk_create(
+        [
+            Account(currency=currency, name=name)
+            for currency in currencies
+            for name in ACCOUNTS[: rng.randint(1, 3)]
+        ]
+    )
+    tags = Tag.objects.bulk_create(
+        [
+            Tag(user=user, name=name)
+            for user in rows
+            for name in rng.sample(TAGS, rng.randint(3, len(TAGS)))
+        ]
+    )
+    user_accounts: dict[Any, list[Any]] = {}
+    for account in accounts:
+        user_accounts.setdefault(account.currency.user_id, []).append(account)
+    user_tags: dict[Any, list[Any]] = {}
+    for tag in tags:
+        user_tags.setdefault(tag.user_id, []).append(tag)
+
+    shares = [rng.paretovariate(1.5) for _ in rows]
+    counts = {u.pk: int(transactions * s / sum(shares)) for u, s in zip(rows, shares)}
+    now = timezone.now()
+    link = Tag.transaction_set.through
+    for user in rows:
+        own = user_accounts[user.pk]
+        weights = [1 / (i + 1) for i in range(len(own))]
+        batch = [
+            ledger_row(rng, rng.choices(own, weights)[0], now)
+            for _ in range(counts[user.pk])
+        ]
+        for start in range(0, len(batch), 5000):
+            Transaction.objects.bulk_create(batch[start : start + 5000])
+        links = [
+            link(transaction_id=row.pk, tag_id=tag.pk)
+            for row in batch
+            for tag in rng.sample(
+                user_tags[user.pk], rng.choices((0, 1, 2), (50, 35, 15))[0]
+            )
+        ]
+        link.objects.bulk_create(links, batch_size=5000)
+    for account in accounts:
+        Transaction.objects.rebalance(account.pk)
+    return sorted(rows, key=lambda u: -counts[u.pk])
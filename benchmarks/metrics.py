@@ -0,0 +1,96 @@
+# cost of the metrics: the writes of the sharded counters and histograms, by
+# one thread and by many at once, and the latency the timing of the resolvers
+# and the metrics add to a listTransactions request of the graphql view
+import argparse
+import json
+import threading
+import time
+from unittest import mock
+
+from benchmarks import database, timeit
+
+
+def writes(func, count: int, threads: int):
+    # nanoseconds per write with the threads writing concurrently
+    def work():
+        for _ in range(count):
+            func()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) * 1e9 / (count * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="metrics overhead")
+    parser.add_argument("--volume", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with database():
+        from django.conf import settings
+        from django.db import transaction
+        from django.test import RequestFactory
+        from graphene_django.settings import graphene_settings
+
+        from benchmarks.generator import generate_ledger
+        from transactions.gql import TransactionSchema
+        from utils.gql import GqlArgument
+        from utils.metrics import SECONDS, registry
+        from utils.persisted import PersistedGraphQLView
+        from utils.timing import TimingMiddleware
+
+        counter = registry.counter("benchmark_total")
+        histogram = registry.histogram("benchmark_seconds", SECONDS)
+        print(f"{'write':>10} {'threads':>8} {'ns':>8}")
+        for threads in (1, 8):
+            for name, func in (
+                ("counter", counter.inc),
+                ("histogram", lambda: histogram.observe(0.02)),
+            ):
+                ns = writes(func, args.writes // threads, threads)
+                print(f"{name:>10} {threads:>8} {ns:>8.0f}")
+
+        query = TransactionSchema.query(
+            TransactionSchema.listTransactions(paginator=GqlArgument(per_page=10))
+        ).render()
+
+        def request(view):
+            def func():
+                request = RequestFactory().post(
+                    "/graphql", json.dumps(dict(query=query)), "application/json"
+                )
+                request.user = user
+                response = view(request)
+                assert "errors" not in json.loads(response.content)
+
+            return func
+
+        # the plain requests skip the database deadline along with the timing,
+        # the measured ones skip it too so that only the metrics are compared
+        settings.GRAPHQL_DATABASE_DEADLINE = None
+        with transaction.atomic():
+            user = generate_ledger(args.volume)
+            middleware = [
+                m for m in graphene_settings.MIDDLEWARE if m is not TimingMiddleware
+            ]
+            with mock.patch.object(
+                PersistedGraphQLView,
+                "execute_graphql_request",
+                PersistedGraphQLView.execute_document,
+            ):
+                view = PersistedGraphQLView.as_view(middleware=middleware)
+                before = timeit(request(view), args.repeat)
+            after = timeit(request(PersistedGraphQLView.as_view()), args.repeat)
+            transaction.set_rollback(True)
+        print(f"{'plain (ms)':>11} {'measured (ms)':>14} {'overhead (ms)':>14}")
+        print(f"{before:>11.3f} {after:>14.3f} {after - before:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# latency of the graphql view per request, parsing and validating the query
+# text every time against executing the cached document of a persisted query
+import argparse
+import json
+
+from benchmarks import database, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="persisted query latency")
+    parser.add_argument("--volume", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with database():
+        from django.db import transaction
+        from django.test import RequestFactory
+        from graphene_django.views import GraphQLView
+
+        from benchmarks.generator import generate_ledger
+        from transactions.gql import TransactionSchema
+        from utils.gql import GqlArgument
+        from utils.persisted import PersistedGraphQLView, digest
+
+        query = TransactionSchema.query(
+            TransactionSchema.listTransactions(paginator=GqlArgument(per_page=10))
+        ).render()
+        persisted = dict(persistedQuery=dict(version=1, sha256Hash=digest(query)))
+
+        def request(view, **data):
+            def func():
+                request = RequestFactory().post(
+                    "/graphql", json.dumps(data), content_type="application/json"
+                )
+                request.user = user
+                response = view(request)
+                assert "errors" not in json.loads(response.content)
+
+            return func
+
+        with transaction.atomic():
+            user = generate_ledger(args.volume)
+            plain = GraphQLView.as_view()
+            view = PersistedGraphQLView.as_view()
+            # registers the query
+            request(view, query=query, extensions=persisted)()
+            before = timeit(request(plain, query=query), args.repeat)
+            after = timeit(request(view, extensions=persisted), args.repeat)
+            transaction.set_rollback(True)
+        print(f"{'text (ms)':>10} {'persisted (ms)':>15} {'saved (ms)':>11}")
+        print(f"{before:>10.2f} {after:>15.2f} {before - after:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
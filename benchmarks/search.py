@@ -0,0 +1,54 @@
+# free text search latency, comparing the icontains lookups of listTransactions
+# with the ranked fts5 matches of searchTransactions
+import argparse
+
+from benchmarks import database, execute, timeit
+
+QUERIES = ("groceries", "market", "refund office")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="free text search latency")
+    parser.add_argument("--volume", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with database():
+        from django.db import transaction
+
+        from benchmarks.generator import generate_ledger
+        from transactions import search
+        from transactions.gql import TransactionSchema
+        from transactions.models import Transaction
+        from utils.gql import GqlArgument
+
+        print(f"{'query':>14} {'icontains (ms)':>15} {'search (ms)':>12}")
+        with transaction.atomic():
+            user = generate_ledger(args.volume)
+            # the generated rows are bulk created without their index rows
+            search.index(Transaction.objects.values_list("pk", flat=True))
+            for text in QUERIES:
+                filter = GqlArgument(
+                    name__icontains=text,
+                    description__icontains=text,
+                    account__name__icontains=text,
+                    tag__name__icontains=text,
+                )
+                before = TransactionSchema.query(
+                    TransactionSchema.listTransactions(
+                        filter=filter, paginator=GqlArgument(per_page=10)
+                    )
+                ).render()
+                after = TransactionSchema.query(
+                    TransactionSchema.searchTransactions(
+                        text, paginator=GqlArgument(per_page=10)
+                    )
+                ).render()
+                before_ms = timeit(lambda: execute(user, before), args.repeat)
+                after_ms = timeit(lambda: execute(user, after), args.repeat)
+                print(f"{text:>14} {before_ms:>15.1f} {after_ms:>12.1f}")
+            transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
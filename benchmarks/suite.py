@@ -0,0 +1,166 @@
+# latency and query count of the main operations on a generated multi-user
+# ledger, written to a JSON file so that two runs can be compared, e.g.
+#   python -m benchmarks.suite --output before.json
+#   python -m benchmarks.suite --output after.json --compare before.json
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+from datetime import datetime, timedelta
+from statistics import median, quantiles
+from typing import Any
+
+from benchmarks import database, execute, timings
+
+
+def scenarios(user: Any):
+    # the name and query of every timed operation, run as the given user
+    from accounts.gql import AccountSchema
+    from transactions.gql import TransactionSchema
+    from transactions.models import Transaction
+    from utils.gql import GqlArgument
+
+    rows = Transaction.objects.filter(account__currency__user=user)
+    row = rows.order_by("-datetime", "-id").first()
+    query = TransactionSchema.query
+    page = GqlArgument(per_page=10)
+    return dict(
+        listTransactions=query(TransactionSchema.listTransactions(paginator=page)),
+        listTransactions_deep_page=query(
+            TransactionSchema.listTransactions(
+                paginator=GqlArgument(per_page=10, page=max(rows.count() // 20, 1))
+            )
+        ),
+        listTransactions_cursor=query(
+            TransactionSchema.listTransactions(
+                paginator=GqlArgument(per_page=10, after="")
+            )
+        ),
+        listTransactions_filtered=query(
+            TransactionSchema.listTransactions(
+                filter=GqlArgument(
+                    operation="DEBIT", name__icontains="groc", datetime__month=3
+                ),
+                paginator=page,
+            )
+        ),
+        listAccounts=AccountSchema.query(AccountSchema.listAccounts(paginator=page)),
+        getTransaction=query(TransactionSchema.getTransaction(row.pk)),
+        createTransaction=TransactionSchema.mutation(
+            TransactionSchema.createTransaction(
+                account=row.account_id,
+                amount="-120.50",
+                datetime=(row.datetime - timedelta(days=30)).isoformat(),
+                name="Groceries",
+            )
+        ),
+        updateTransaction=TransactionSchema.mutation(
+            TransactionSchema.updateTransaction(id=row.pk, amount="-99.75")
+        ),
+    )
+
+
+def measure(user: Any, query: str, repeat: int):
+    # every run is rolled back so that the mutations see the same ledger
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    def run():
+        with transaction.atomic():
+            execute(user, query)
+            transaction.set_rollback(True)
+
+    with CaptureQueriesContext(connection) as context:
+        run()
+    # the savepoint and its rollback are not queries of the operation
+    queries = [q for q in context.captured_queries if "SAVEPOINT" not in q["sql"]]
+    times = timings(run, repeat)
+    return dict(
+        median_ms=round(median(times), 3),
+        p95_ms=round(quantiles(times, n=20)[-1], 3) if repeat > 1 else None,
+        min_ms=round(min(times), 3),
+        queries=len(queries),
+    )
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, Any], path: str):
+    with open(path) as file:
+        previous = json.load(file)["results"]
+    print(f"\n{'scenario':>28} {'before (ms)':>12} {'after (ms)':>11} {'change':>8}")
+    for name, result in results.items():
+        if name not in previous:
+            continue
+        before, after = previous[name]["median_ms"], result["median_ms"]
+        change = f"{(after - before) / before:+.0%}" if before else ""
+        print(f"{name:>28} {before:>12.2f} {after:>11.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark suite")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="a previous output to compare with")
+    args = parser.parse_args()
+
+    with database():
+        import django
+        from django.db import transaction
+
+        from benchmarks.generator import generate_users
+        from transactions.models import Transaction
+
+        with transaction.atomic():
+            user = generate_users(args.users, args.transactions, args.seed)[0]
+            results = {
+                name: measure(user, operation.render(), args.repeat)
+                for name, operation in scenarios(user).items()
+            }
+            rows = Transaction.objects.filter(account__currency__user=user).count()
+            transaction.set_rollback(True)
+
+    report = dict(
+        meta=dict(
+            date=datetime.now().isoformat(timespec="seconds"),
+            revision=revision(),
+            python=platform.python_version(),
+            django=django.get_version(),
+            sqlite=sqlite3.sqlite_version,
+            users=args.users,
+            transactions=args.transactions,
+            user_transactions=rows,
+            seed=args.seed,
+            repeat=args.repeat,
+        ),
+        results=results,
+    )
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"{'scenario':>28} {'median (ms)':>12} {'p95 (ms)':>9} {'queries':>8}")
+    for name, result in results.items():
+        p95 = result["p95_ms"] if result["p95_ms"] is not None else float("nan")
+        print(
+            f"{name:>28} {result['median_ms']:>12.2f} {p95:>9.2f}"
+            f" {result['queries']:>8}"
+        )
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,7 @@ from utils import filter_order_paginate
 from utils.filter import filter_to_filter_input_class
 from utils.order import form_to_order_argument
 from utils.paginator import PaginatorQueryInput, PaginatorQueryPayload
+from utils.planner import plan
 
 
 class GivenCurrencyType(DjangoObjectType):
@@ -83,7 +84,9 @@ class CurrencyQuery(ObjectType):
     @staticmethod
     @login_required
     def resolve_get_currency(root, info, input: GetCurrencyQueryInput):
-        data = Currency._default_manager.get(pk=input.id, user=info.context.user)
+        data = plan(Currency._default_manager.all(), info).get(
+            pk=input.id, user=info.context.user
+        )
         return GetCurrencyQueryPayload(data=data)  # type: ignore
 
     @staticmethod
@@ -119,7 +122,7 @@ class CurrencyQuery(ObjectType):
         paginator: PaginatorQueryInput | None = None,
     ):
         data = Currency._default_manager.filter(user=info.context.user)
-        data, kwargs = filter_order_paginate(data, filter, order, paginator)
+        data, kwargs = filter_order_paginate(data, filter, order, paginator, info)
         return ListCurrenciesQueryPayload(data=data, **kwargs)  # type: ignore
 
 
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-18 18:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0002_alter_tag_unique_together'),
+    ]
+
+    operations = [
+        # the auto-created through table only has single column indexes on the
+        # transaction side, this one covers loading the tags of transactions
+        migrations.RunSQL(
+            'CREATE INDEX "tags_tag_transaction_set_transaction_tag_idx" '
+            'ON "tags_tag_transaction_set" ("transaction_id", "tag_id");',
+            'DROP INDEX "tags_tag_transaction_set_transaction_tag_idx";',
+        ),
+    ]
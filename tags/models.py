@@ -1,10 +1,103 @@
+from collections.abc import Iterable
+from functools import reduce
+from operator import or_
+from typing import Any
+
 from django.db import models
+from django.db.models import Q
 
+from transactions import search
 from transactions.models import Transaction
 from users.models import User
 
+# (transaction, tag names, tag ids) to link or unlink
+TagRows = Iterable[tuple[Transaction, Iterable[str], Iterable[Any]]]
+
+
+class TagManager(models.Manager):
+    def resolve(
+        self,
+        user: User,
+        names: Iterable[str] = (),
+        ids: Iterable[Any] = (),
+        create: bool = False,
+    ):
+        # the user's tags matching any of the names or ids in a single query,
+        # missing names are bulk created when asked to
+        names = list(dict.fromkeys(n.strip() for n in names if n.strip()))
+        ids = [str(i).strip() for i in dict.fromkeys(ids) if str(i).strip().isdigit()]
+        if not names and not ids:
+            return []
+        tags = list(self.filter(Q(name__in=names) | Q(pk__in=ids), user=user))
+        if create:
+            existing = {t.name for t in tags}
+            missing = [n for n in names if n not in existing]
+            if missing:
+                # concurrent requests may have created some of them already,
+                # so the conflicts are ignored and the rows fetched again
+                self.bulk_create(
+                    [self.model(user=user, name=n) for n in missing],
+                    ignore_conflicts=True,
+                )
+                tags.extend(self.filter(user=user, name__in=missing))
+        return tags
+
+    def link(self, user: User, rows: TagRows):
+        rows = [(t, list(names), list(ids)) for t, names, ids in rows]
+        tags = self.resolve(
+            user,
+            (n for _, names, _ in rows for n in names),
+            (i for _, _, ids in rows for i in ids),
+            create=True,
+        )
+        by_name = {t.name: t.pk for t in tags}
+        by_id = {str(t.pk): t.pk for t in tags}
+        Through = self.model.transaction_set.through
+        links = [
+            Through(transaction_id=transaction.pk, tag_id=pk)
+            for transaction, names, ids in rows
+            for pk in self.pks(names, ids, by_name, by_id)
+        ]
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+        search.index(link.transaction_id for link in links)
+
+    def unlink(self, user: User, rows: TagRows):
+        rows = [(t, list(names), list(ids)) for t, names, ids in rows]
+        tags = self.resolve(
+            user,
+            (n for _, names, _ in rows for n in names),
+            (i for _, _, ids in rows for i in ids),
+        )
+        by_name = {t.name: t.pk for t in tags}
+        by_id = {str(t.pk): t.pk for t in tags}
+        unlinked = [
+            (transaction.pk, pks)
+            for transaction, names, ids in rows
+            if (pks := self.pks(names, ids, by_name, by_id))
+        ]
+        if unlinked:
+            Through = self.model.transaction_set.through
+            Through.objects.filter(
+                reduce(or_, (Q(transaction_id=t, tag_id__in=p) for t, p in unlinked))
+            ).delete()
+            search.index(t for t, _ in unlinked)
+
+    @classmethod
+    def pks(
+        cls,
+        names: list[str],
+        ids: list[Any],
+        by_name: dict[str, Any],
+        by_id: dict[str, Any],
+    ):
+        pks = [by_name.get(n.strip()) for n in names]
+        pks += [by_id.get(str(i).strip()) for i in ids]
+        return list(dict.fromkeys(pk for pk in pks if pk is not None))
+
 
 class Tag(models.Model):
+    objects = TagManager()
+
     user = models.ForeignKey(User, models.CASCADE)
     name = models.CharField(max_length=50, default="")
     transaction_set = models.ManyToManyField(Transaction)
@@ -25,6 +25,7 @@ from utils import filter_order_paginate
 from utils.filter import filter_to_filter_input_class
 from utils.order import form_to_order_argument
 from utils.paginator import PaginatorQueryInput, PaginatorQueryPayload
+from utils.planner import plan
 
 
 class TagType(DjangoObjectType):
@@ -67,7 +68,9 @@ class TagQuery(ObjectType):
     @staticmethod
     @login_required
     def resolve_get_tag(root, info, input: GetTagQueryInput):
-        data = Tag._default_manager.get(pk=input.id, user=info.context.user)
+        data = plan(Tag._default_manager.all(), info).get(
+            pk=input.id, user=info.context.user
+        )
         return GetTagQueryPayload(data=data)  # type: ignore
 
     @staticmethod
@@ -80,7 +83,7 @@ class TagQuery(ObjectType):
         paginator: PaginatorQueryInput | None = None,
     ):
         data = Tag._default_manager.filter(user=info.context.user)
-        data, kwargs = filter_order_paginate(data, filter, order, paginator)
+        data, kwargs = filter_order_paginate(data, filter, order, paginator, info)
         return ListTagsQueryPayload(data=data, **kwargs)  # type: ignore
 
     @staticmethod
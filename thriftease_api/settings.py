@@ -139,12 +139,61 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 GRAPHENE = {
     "SCHEMA": "thriftease_api.schemas.schema",
     "MIDDLEWARE": [
+        "utils.timing.TimingMiddleware",
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
+        "utils.counts.CountInvalidationMiddleware",
+        "utils.loaders.LoaderMiddleware",
     ],
 }
 
+# seconds the list counts stay cached, mutations through the api invalidate
+# them sooner but writes elsewhere (e.g. maturation) only expire them. With
+# the default process-local cache the other worker processes only see the
+# invalidations of their own mutations (warned by utils.W001), a cache shared
+# by the processes (e.g. redis) or 0 keeps the counts of every process exact.
+LIST_COUNT_CACHE_TIMEOUT = 300
+
+# parsed and validated documents kept per process by the graphql view, and
+# the {id: query} allow-list of the operations the clients are built with,
+# which becomes the only queries allowed when GRAPHQL_PERSISTED_QUERIES_ONLY
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+GRAPHQL_PERSISTED_QUERIES = BASE_DIR / "persisted_queries.json"
+GRAPHQL_PERSISTED_QUERIES_ONLY = False
+
+# static limits of the operations the graphql view accepts (see utils.cost):
+# the nesting depth and the cost, the weight of the object fields counted once
+# per row, the paginated lists counting perPage rows and the others
+# GRAPHQL_COST_LIST_SIZE rows, and the seconds a request may keep the
+# database busy before its queries are interrupted
+GRAPHQL_MAX_DEPTH = 8
+GRAPHQL_MAX_COST = 5000
+GRAPHQL_COST_LIST_SIZE = 20
+GRAPHQL_COST_WEIGHTS = {
+    "Query.searchTransactions": 10,
+    "Query.accountBalanceAsOf": 5,
+    "AccountType.balance": 1,
+    "AccountType.futureBalance": 1,
+}
+GRAPHQL_DATABASE_DEADLINE = 10
+
+# requests with this header get the wall time, sql query count and sql time
+# of every resolver as extensions.timing, the other requests time only the
+# fields of objects for the process metrics of utils.metrics (see /metrics)
+GRAPHQL_TIMING_HEADER = "X-Debug-Timing"
+
+# the addresses allowed to read the /metrics of the process
+METRICS_ADDRESSES = ["127.0.0.1", "::1"]
+
+# the largest perPage a paginated list returns
+PAGINATOR_MAX_PER_PAGE = 100
+
 CORS_ALLOW_ALL_ORIGINS = True
 
+# how listTransactions/getTransaction read the running account balances:
+# "stored" columns, a single "window" function scan per page, or the original
+# per-row "subquery" (slow, for verification)
+TRANSACTION_BALANCE_MODE = "stored"
+
 LANGUAGES = [
     ("en-ph", _("English (Philippines)")),
     ("tl", _("Tagalog")),
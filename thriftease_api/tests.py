@@ -1,11 +1,27 @@
+import json
+import re
+import threading
 from typing import Any
+from unittest import mock
 
 import pytest
+from django.core.cache import cache
+from django.db import connection
 from graphene_django.utils.testing import graphql_query
+from graphql import parse
+
+from utils.metrics import Histogram
+from utils.persisted import PersistedGraphQLView, allow_list, digest
 
 
 @pytest.mark.django_db
 class TestGraphQL:
+    @pytest.fixture(autouse=True)
+    @staticmethod
+    def clear_cache():
+        # cached counts must not leak between tests reusing the same ids
+        cache.clear()
+
     @pytest.fixture
     @staticmethod
     def gql(client):
@@ -41,3 +57,158 @@ class TestGraphQL:
                         if m == e["message"]:
                             return True
         return False
+
+    @classmethod
+    def full_scans(cls, queries: list[dict[str, Any]], *tables: str):
+        # tables read with a full table scan according to EXPLAIN QUERY PLAN,
+        # scans of a covering or ordered index are fine
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                for row in cursor.fetchall():
+                    match = re.fullmatch(r"SCAN (\w+)(?: AS \w+)?", row[-1])
+                    if match and (not tables or match[1] in tables):
+                        scans.append((match[1], query["sql"]))
+        return scans
+
+
+class PersistedQueriesMixin:
+    # posts to the graphql view with a fresh document cache, without tests of
+    # its own so that the test classes using it do not collect them again
+    QUERY = "{ __typename }"
+
+    @staticmethod
+    def post(client: Any, **data: Any):
+        response = client.post("/graphql", data, content_type="application/json")
+        return json.loads(response.content)
+
+    @pytest.fixture(autouse=True)
+    @staticmethod
+    def clear_documents():
+        PersistedGraphQLView.documents.entries.clear()
+        allow_list.cache_clear()
+        yield
+        allow_list.cache_clear()
+
+
+class TestPersistedQueries(PersistedQueriesMixin, TestGraphQL):
+    def test_automatic(self, client: Any):
+        persisted = dict(persistedQuery=dict(version=1, sha256Hash=digest(self.QUERY)))
+        content = self.post(client, extensions=persisted)
+        assert content["errors"][0]["message"] == "PersistedQueryNotFound"
+
+        # registered by sending the text along, parsed only once
+        with mock.patch("utils.persisted.parse", wraps=parse) as parsed:
+            content = self.post(client, query=self.QUERY, extensions=persisted)
+            assert content["data"] == {"__typename": "Query"}
+            content = self.post(client, extensions=persisted)
+            assert content["data"] == {"__typename": "Query"}
+            content = self.post(client, query=self.QUERY)
+            assert content["data"] == {"__typename": "Query"}
+        assert parsed.call_count == 1
+
+        persisted["persistedQuery"]["sha256Hash"] = digest("{ other }")
+        content = self.post(client, query=self.QUERY, extensions=persisted)
+        assert content["errors"][0]["message"] == "The query does not match its hash."
+
+    def test_allow_list(self, client: Any, settings: Any, tmp_path: Any):
+        path = tmp_path / "persisted_queries.json"
+        path.write_text(json.dumps(dict(typename=self.QUERY)))
+        settings.GRAPHQL_PERSISTED_QUERIES = path
+        settings.GRAPHQL_PERSISTED_QUERIES_ONLY = True
+
+        assert self.post(client, id="typename")["data"] == {"__typename": "Query"}
+        persisted = dict(persistedQuery=dict(version=1, sha256Hash=digest(self.QUERY)))
+        content = self.post(client, extensions=persisted)
+        assert content["data"] == {"__typename": "Query"}
+
+        content = self.post(client, query=self.QUERY)
+        assert content["errors"][0]["message"] == "Only persisted queries are allowed."
+        content = self.post(client, id="unknown")
+        assert content["errors"][0]["message"] == "PersistedQueryNotFound"
+
+
+class TestQueryCost(PersistedQueriesMixin, TestGraphQL):
+    @staticmethod
+    def executed(content: dict[str, Any]):
+        # validated and then denied to the anonymous client
+        return content["errors"][0]["path"] == ["listTransactions"]
+
+    def test_cost(self, client: Any, settings: Any):
+        query = """{ listTransactions(paginator: {perPage: %s}) {
+            data { id account { currency { name } } tagSet { name } }
+        } }"""
+        # 1 + perPage rows of the transaction, its account, currency and 20 tags
+        assert self.executed(self.post(client, query=query % 10))
+        settings.GRAPHQL_MAX_COST = 250
+        content = self.post(client, query=query % 11)
+        assert content["errors"][0]["message"] == (
+            "The operation costs 254, more than the limit of 250."
+        )
+        # perPage is capped, and assumed to be the cap when it is a variable
+        settings.GRAPHQL_MAX_COST = 2301
+        assert self.executed(self.post(client, query=query % 10000))
+        variable = query.replace("{perPage: %s}", "$paginator")
+        variable = f"query ($paginator: PaginatorQueryInput) {variable}"
+        assert self.executed(self.post(client, query=variable))
+        settings.GRAPHQL_MAX_COST = 2300
+        content = self.post(client, query=query % 100 + " ")
+        assert content["errors"][0]["message"] == (
+            "The operation costs 2301, more than the limit of 2300."
+        )
+
+    def test_depth(self, client: Any, settings: Any):
+        query = """{ getTransaction(input: {id: 1}) {
+            data { account { currency { user { id } } } }
+        } }"""
+        settings.GRAPHQL_MAX_DEPTH = 5
+        content = self.post(client, query=query)
+        assert content["errors"][0]["message"] == (
+            "The operation is nested 6 levels deep, more than the limit of 5."
+        )
+        # the introspection is not counted
+        query = (
+            "{ __schema { types { fields { type { ofType { ofType { name } } } } } } }"
+        )
+        content = self.post(client, query=query)
+        assert content["data"]["__schema"]["types"]
+
+
+class TestMetrics(PersistedQueriesMixin, TestGraphQL):
+    def test_histogram(self):
+        histogram = Histogram((1, 2, 4))
+        threads = [
+            threading.Thread(
+                target=lambda: [histogram.observe(v % 5) for v in range(1000)]
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 0, 1 | 2 | 3, 4 | none past 4
+        assert histogram.counts == [3200, 1600, 3200, 0]
+        assert histogram.sum == 8 * 200 * 10
+        assert histogram.quantile(0.5) == 1.5
+        assert histogram.quantile(0.99) == pytest.approx(3.95)
+
+    def test_view(self, client: Any):
+        self.post(client, query=self.QUERY)
+        self.post(client, query="{ test }")
+        self.post(client, query="{ test }")
+        response = client.get("/metrics")
+        assert response["Content-Type"].startswith("text/plain")
+        lines = response.content.decode().splitlines()
+        assert 'graphql_request_seconds_count{operation="test"} 2' in lines
+        assert any(
+            line.startswith(
+                'graphql_request_seconds_quantile{operation="test",quantile="0.95"} '
+            )
+            for line in lines
+        )
+        assert 'graphql_error_ratio{operation="__typename"} 0.0' in lines
+        assert client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code == 404
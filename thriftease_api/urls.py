@@ -17,14 +17,18 @@ Including another URLconf
 # from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 
 from thriftease_api import settings
+from thriftease_api.views import metrics
+from transactions.views import export_transactions
+from utils.persisted import PersistedGraphQLView
 
-gql_view = GraphQLView.as_view(graphiql=True)
+gql_view = PersistedGraphQLView.as_view(graphiql=True)
 gql_view = csrf_exempt(gql_view) if getattr(settings, "DEBUG", False) else gql_view
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path("graphql", gql_view),
+    path("export/transactions", export_transactions),
+    path("metrics", metrics),
 ]
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+from django.views.decorators.http import require_GET
+
+from utils.metrics import registry
+
+
+@require_GET
+def metrics(request: HttpRequest):
+    # the metrics of the process for a scraper running next to it, e.g. the
+    # per operation latency, sql query count and error ratio of graphql
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ADDRESSES:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
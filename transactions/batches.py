@@ -0,0 +1,184 @@
+from collections.abc import Iterable
+from datetime import datetime as Datetime
+from typing import Any
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from accounts.models import Account
+from transactions import search
+from transactions.forms import BulkTransactionForm
+from transactions.models import Transaction, TransactionSearch
+from users.models import User
+
+FIELDS = ("amount", "datetime", "name", "description")
+LOCAL_PARTS = ("local_month", "local_day", "local_hour")
+
+
+def row_error(index: int, field: str, *messages: str):
+    return dict(row=index, field=field, messages=list(messages))
+
+
+def owned_accounts(user: User, values: Iterable[Any]):
+    # every referenced account is checked with a single query
+    pks = {str(v).strip() for v in values if v is not None}
+    return set(
+        Account.objects.filter(
+            pk__in={pk for pk in pks if pk.isdigit()}, currency__user=user
+        ).values_list("pk", flat=True)
+    )
+
+
+def owned_transactions(user: User, values: Iterable[Any]):
+    pks = {str(v).strip() for v in values if v is not None}
+    return Transaction._base_manager.filter(
+        pk__in={pk for pk in pks if pk.isdigit()}, account__currency__user=user
+    ).in_bulk()
+
+
+def move(positions: dict[int, Datetime], account_id: int, datetime: Datetime):
+    position = positions.get(account_id)
+    if position is None or datetime < position:
+        positions[account_id] = datetime
+
+
+def rebalance(positions: dict[int, Datetime]):
+    # each affected account is rebalanced once from its earliest changed row
+    for account_id, datetime in positions.items():
+        Transaction.objects.rebalance(account_id, datetime)
+
+
+def refetch(pks: list[Any]):
+    rows = Transaction.objects.in_bulk(pks)
+    return [rows[pk] for pk in pks]
+
+
+class TransactionBatch:
+    # validates every row first and writes nothing unless all of them are
+    # valid, so a synced batch is applied as a whole or not at all
+    def __init__(self, user: User):
+        self.user = user
+        self.errors: list[dict[str, Any]] = []
+
+    def check_account(self, index: int, value: Any, accounts: set[int]):
+        if value is None or not str(value).strip():
+            self.errors.append(
+                row_error(index, "account", _("This field is required."))
+            )
+            return None
+        value = str(value).strip()
+        if not value.isdigit() or int(value) not in accounts:
+            self.errors.append(
+                row_error(
+                    index,
+                    "account",
+                    _(
+                        "Select a valid choice. That choice is not one of the "
+                        "available choices."
+                    ),
+                )
+            )
+            return None
+        return int(value)
+
+    def check_form(self, index: int, input: dict[str, Any], instance=None):
+        data = {k: v for k, v in input.items() if k in FIELDS and v is not None}
+        form = BulkTransactionForm(data=data, instance=instance)
+        if not form.is_valid():
+            for field, messages in form.errors.items():
+                self.errors.append(row_error(index, field, *messages))
+            return None
+        return form.save(commit=False)
+
+    def create(self, inputs: list[dict[str, Any]]):
+        accounts = owned_accounts(self.user, (i.get("account") for i in inputs))
+        instances: list[Transaction] = []
+        for index, input in enumerate(inputs):
+            account_id = self.check_account(index, input.get("account"), accounts)
+            instance = self.check_form(index, input)
+            if account_id is not None and instance is not None:
+                instance.account_id = account_id
+                instances.append(instance)
+        if self.errors:
+            return []
+
+        positions: dict[int, Datetime] = {}
+        with db_transaction.atomic():
+            now = timezone.now()
+            for instance in instances:
+                instance.scheduled = instance.datetime > now
+                instance.set_local_parts()
+                move(positions, instance.account_id, instance.datetime)
+            instances = Transaction.objects.bulk_create(instances)
+            rebalance(positions)
+            search.index(instance.pk for instance in instances)
+        return refetch([instance.pk for instance in instances])
+
+    def update(self, inputs: list[dict[str, Any]]):
+        existing = owned_transactions(self.user, (i.get("id") for i in inputs))
+        accounts = owned_accounts(self.user, (i.get("account") for i in inputs))
+        # the old positions of the rows, before the forms change them
+        previous = {pk: (r.account_id, r.datetime) for pk, r in existing.items()}
+        instances: list[Transaction] = []
+        for index, input in enumerate(inputs):
+            pk = str(input.get("id", "")).strip()
+            instance = existing.get(int(pk)) if pk.isdigit() else None
+            if instance is None:
+                self.errors.append(
+                    row_error(
+                        index, "id", _("Transaction matching query does not exist.")
+                    )
+                )
+                continue
+            account_id = instance.account_id
+            if input.get("account") is not None:
+                account_id = self.check_account(index, input["account"], accounts)
+            instance = self.check_form(index, input, instance)
+            if account_id is not None and instance is not None:
+                instance.account_id = account_id
+                instances.append(instance)
+        if self.errors:
+            return []
+
+        positions: dict[int, Datetime] = {}
+        with db_transaction.atomic():
+            now = timezone.now()
+            for instance in instances:
+                instance.scheduled = instance.datetime > now
+                instance.set_local_parts()
+                move(positions, *previous[instance.pk])
+                move(positions, instance.account_id, instance.datetime)
+            Transaction._base_manager.bulk_update(
+                instances, ["account", *FIELDS, "scheduled", *LOCAL_PARTS]
+            )
+            rebalance(positions)
+            search.index(instance.pk for instance in instances)
+        return refetch([instance.pk for instance in instances])
+
+    def delete(self, ids: list[Any]):
+        existing = owned_transactions(self.user, ids)
+        instances: list[Transaction] = []
+        for index, pk in enumerate(ids):
+            pk = str(pk).strip()
+            instance = existing.get(int(pk)) if pk.isdigit() else None
+            if instance is None:
+                self.errors.append(
+                    row_error(
+                        index, "id", _("Transaction matching query does not exist.")
+                    )
+                )
+            else:
+                instances.append(instance)
+        if self.errors:
+            return []
+
+        positions: dict[int, Datetime] = {}
+        with db_transaction.atomic():
+            for instance in instances:
+                move(positions, instance.account_id, instance.datetime)
+            pks = [instance.pk for instance in instances]
+            Transaction._base_manager.filter(pk__in=pks).delete()
+            TransactionSearch.objects.remove(pks)
+            rebalance(positions)
+        return instances
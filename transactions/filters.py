@@ -1,13 +1,44 @@
+from typing import Any
+
 import django_filters as dj
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from transactions.models import Transaction, TransactionOperation
+from utils.filter import OrFilterSet, decimal_range, exact_number, sign
 
-from transactions.models import Transaction
-from utils.filter import OrFilterSet
+
+def is_scheduled(value: Any):
+    # the future-dated rows, the stored flag narrows them down to the partial
+    # index of the rows the maturation worker has not moved yet. The database
+    # clock keeps the sql, and so the key of the cached counts, the same from
+    # one request to the next, the counts then lag the clock by at most the
+    # LIST_COUNT_CACHE_TIMEOUT like they do the maturation.
+    now = Now()
+    if value:
+        return Q(scheduled=True, datetime__gt=now)
+    return Q(datetime__lte=now)
 
 
 class TransactionFilter(OrFilterSet):
     operation = dj.CharFilter()
     scheduled = dj.BooleanFilter()
 
+    rewrites = dict(
+        scheduled=is_scheduled,
+        operation=sign(
+            "amount", TransactionOperation.DEBIT, TransactionOperation.CREDIT
+        ),
+        id__icontains=exact_number("id"),
+        account__id__icontains=exact_number("account_id"),
+        amount__icontains=decimal_range("amount"),
+        # the stored local calendar parts instead of the time zone conversion
+        # of every row
+        datetime__month=exact_number("local_month"),
+        datetime__day=exact_number("local_day"),
+        datetime__hour=exact_number("local_hour"),
+    )
+
     class Meta:
         model = Transaction
         fields = {
@@ -56,3 +56,21 @@ class OrderTransactionForm(forms.ModelForm):
             "id",
             "datetime",
         )
+
+
+class BulkTransactionForm(forms.ModelForm):
+    # the accounts of bulk writes are checked for the whole batch at once
+    class Meta:
+        model = Transaction
+        fields = (
+            "amount",
+            "datetime",
+            "name",
+            "description",
+        )
+        formfield_callback = formfield_extra_kwargs(
+            amount=dict(required=False),
+            datetime=dict(required=False),
+            name=dict(required=False),
+            description=dict(required=False),
+        )
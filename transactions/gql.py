@@ -0,0 +1,141 @@
+from typing import Any
+
+from thriftease_api.gql import Schema
+from utils.gql import GqlAction, GqlArgument, GqlType, GqlVariable
+
+
+class TransactionSchema(Schema):
+    TransactionType = GqlType(
+        "id",
+        "amount",
+        "datetime",
+        "name",
+        "description",
+        "old_account_balance",
+        "new_account_balance",
+        "scheduled",
+        "operation",
+    )
+    TransactionPayload = GqlType(data=TransactionType, errors=Schema.ErrorType)
+    RowErrorType = GqlType("row", "field", "messages")
+    ImportTransactionsPayload = GqlType("count", errors=RowErrorType)
+    BatchTransactionsPayload = GqlType(data=TransactionType, errors=RowErrorType)
+    PageType = GqlType("previous", "current", "next")
+    PaginatorType = GqlType(
+        "per_page", "items", "pages", "after", "before", page=PageType
+    )
+    CursorPaginatorType = GqlType("per_page", "after", "before")
+    ListTransactionsPayload = GqlType(
+        data=TransactionType, paginator=PaginatorType, cursor=CursorPaginatorType
+    )
+    GetTransactionPayload = GqlType(data=TransactionType)
+    CreateTransactionMutationInput = GqlArgument(
+        input=GqlArgument(
+            account=None,
+            amount=None,
+            datetime=None,
+            name=None,
+            description=None,
+        )
+    )
+    UpdateTransactionMutationInput = GqlArgument(
+        input=GqlArgument(
+            id=None,
+        )
+    )
+    DeleteTransactionMutationInput = GqlArgument(
+        input=GqlArgument(
+            id=None,
+        )
+    )
+
+    @classmethod
+    def createTransaction(cls, **kwargs):
+        act = GqlAction(
+            "createTransaction",
+            cls.CreateTransactionMutationInput(input=kwargs),
+            cls.TransactionPayload,
+        )
+        return act
+
+    @classmethod
+    def updateTransaction(cls, **kwargs):
+        act = GqlAction(
+            "updateTransaction",
+            cls.UpdateTransactionMutationInput(input=kwargs),
+            cls.TransactionPayload,
+        )
+        return act
+
+    @classmethod
+    def deleteTransaction(cls, id: Any):
+        act = GqlAction(
+            "deleteTransaction",
+            cls.DeleteTransactionMutationInput(input=dict(id=id)),
+            cls.TransactionPayload,
+        )
+        return act
+
+    @classmethod
+    def importTransactions(cls, **kwargs):
+        # the file is always sent as the $file variable of a multipart request
+        act = GqlAction(
+            "importTransactions",
+            GqlArgument(file=GqlVariable("$file"), **kwargs),
+            cls.ImportTransactionsPayload,
+        )
+        return act
+
+    @classmethod
+    def createTransactions(cls, *inputs: dict[str, Any]):
+        act = GqlAction(
+            "createTransactions",
+            GqlArgument(input=list(inputs)),
+            cls.BatchTransactionsPayload,
+        )
+        return act
+
+    @classmethod
+    def updateTransactions(cls, *inputs: dict[str, Any]):
+        act = GqlAction(
+            "updateTransactions",
+            GqlArgument(input=list(inputs)),
+            cls.BatchTransactionsPayload,
+        )
+        return act
+
+    @classmethod
+    def deleteTransactions(cls, *ids: Any):
+        act = GqlAction(
+            "deleteTransactions",
+            GqlArgument(ids=list(ids)),
+            cls.BatchTransactionsPayload,
+        )
+        return act
+
+    @classmethod
+    def getTransaction(cls, id: Any):
+        act = GqlAction(
+            "getTransaction",
+            GqlArgument(input=GqlArgument(id=id)),
+            cls.GetTransactionPayload,
+        )
+        return act
+
+    @classmethod
+    def listTransactions(cls, **kwargs):
+        act = GqlAction(
+            "listTransactions",
+            GqlArgument(**kwargs),
+            cls.ListTransactionsPayload,
+        )
+        return act
+
+    @classmethod
+    def searchTransactions(cls, query: str, **kwargs):
+        act = GqlAction(
+            "searchTransactions",
+            GqlArgument(query=query, **kwargs),
+            cls.ListTransactionsPayload,
+        )
+        return act
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+from datetime import datetime as Datetime
+from enum import StrEnum
+from itertools import islice
+from typing import Any
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from tags.models import Tag
+from transactions import search
+from transactions.batches import (
+    TransactionBatch,
+    move,
+    owned_accounts,
+    rebalance,
+    row_error,
+)
+from transactions.forms import BulkTransactionForm
+from transactions.models import Transaction
+from users.models import User
+
+Row = tuple[int, dict[str, Any]]
+
+
+class ImportFormat(StrEnum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+def detect_format(file: Any):
+    name = str(getattr(file, "name", "") or "").lower()
+    content_type = str(getattr(file, "content_type", "") or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return ImportFormat.NDJSON
+    return ImportFormat.CSV
+
+
+def read_rows(file: Any, format: ImportFormat | None = None) -> Iterator[Row]:
+    # yields (row number, fields) pairs while reading the file, the whole
+    # upload is never held in memory at once
+    format = format or detect_format(file)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if format == ImportFormat.CSV:
+        # the header line is not counted as a row
+        for number, fields in enumerate(csv.DictReader(text), 1):
+            yield number, fields
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            fields = None
+        yield number, fields if isinstance(fields, dict) else {None: line}
+
+
+def batched(rows: Iterable[Row], size: int) -> Iterator[list[Row]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def split_tags(value: Any) -> list[str]:
+    # csv cells hold the tag names separated by semicolons
+    values = value if isinstance(value, list) else str(value or "").split(";")
+    tags: list[str] = []
+    for t in map(lambda e: str(e).strip(), values):
+        if t and t not in tags:
+            tags.append(t)
+    return tags
+
+
+class TransactionImporter:
+    def __init__(self, user: User, batch_size: int = 500):
+        self.user = user
+        self.batch_size = batch_size
+        self.count = 0
+        # the account checks of the batch mutations, reporting to its errors
+        self.checks = TransactionBatch(user)
+        self.errors = self.checks.errors
+        # earliest imported datetime of every affected account
+        self.positions: dict[int, Datetime] = {}
+
+    def run(self, rows: Iterable[Row]):
+        with db_transaction.atomic():
+            for batch in batched(rows, self.batch_size):
+                self.import_batch(batch)
+            # the bulk created rows are inserted without balances
+            rebalance(self.positions)
+        return self
+
+    def import_batch(self, batch: list[Row]):
+        # every account of the batch is checked with a single query
+        accounts = owned_accounts(
+            self.user, (fields.get("account") for number, fields in batch)
+        )
+
+        instances: list[Transaction] = []
+        tags: list[list[str]] = []
+        for number, fields in batch:
+            instance = self.validate(number, fields, accounts)
+            if instance is not None:
+                instances.append(instance)
+                tags.append(split_tags(fields.get("tags")))
+        if not instances:
+            return
+
+        instances = Transaction.objects.bulk_create(instances)
+        self.count += len(instances)
+        search.index(instance.pk for instance in instances)
+        for instance in instances:
+            move(self.positions, instance.account_id, instance.datetime)
+        # the tags of the whole batch are resolved and linked at once
+        Tag.objects.link(self.user, ((i, ts, ()) for i, ts in zip(instances, tags)))
+
+    def validate(self, number: int, fields: dict[Any, Any], accounts: set[int]):
+        if None in fields:
+            self.errors.append(
+                row_error(number, "__all__", _("The row could not be parsed."))
+            )
+            return None
+
+        account_id = self.checks.check_account(number, fields.get("account"), accounts)
+        if account_id is None:
+            return None
+
+        # empty cells fall back to the model defaults like omitted inputs do
+        data = {
+            k: v
+            for k, v in fields.items()
+            if k in BulkTransactionForm._meta.fields and v not in ("", None)
+        }
+        form = BulkTransactionForm(data=data)
+        if not form.is_valid():
+            for field, messages in form.errors.items():
+                self.errors.append(row_error(number, field, *messages))
+            return None
+        if any(len(t) > 50 for t in split_tags(fields.get("tags"))):
+            self.errors.append(
+                row_error(
+                    number,
+                    "tags",
+                    _("Ensure tag names have at most 50 characters."),
+                )
+            )
+            return None
+
+        instance: Transaction = form.save(commit=False)
+        instance.account_id = account_id
+        instance.scheduled = instance.datetime > timezone.now()
+        instance.set_local_parts()
+        return instance
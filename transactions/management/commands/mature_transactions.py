@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the amounts of scheduled transactions into the current balance of "
+        "their accounts once they are due, waking at the next scheduled datetime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Mature the transactions that are due and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Maximum seconds to sleep, so newly scheduled transactions are "
+            "picked up.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = Transaction.objects.mature()
+            if count:
+                self.stdout.write(f"Matured {count} transaction(s).")
+            if options["once"]:
+                return
+
+            delay = options["interval"]
+            next_scheduled = Transaction.objects.get_next_scheduled()
+            if next_scheduled is not None:
+                delay = min(delay, (next_scheduled - timezone.now()).total_seconds())
+            time.sleep(max(delay, 0))
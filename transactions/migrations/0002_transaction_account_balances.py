@@ -0,0 +1,46 @@
+# Generated by Django 5.0 on 2026-10-18 18:12
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def fill_account_balances(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    rows = Transaction.objects.order_by('account_id', 'datetime', 'id')
+    account_id, balance, batch = None, Decimal('0'), []
+    for row in rows.only('account_id', 'amount').iterator(chunk_size=1000):
+        if row.account_id != account_id:
+            account_id, balance = row.account_id, Decimal('0')
+        row.old_account_balance = balance
+        row.new_account_balance = balance = balance + row.amount
+        batch.append(row)
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, ['old_account_balance', 'new_account_balance'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['old_account_balance', 'new_account_balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='transaction',
+            options={'base_manager_name': 'objects'},
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='new_account_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='old_account_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=18),
+        ),
+        migrations.RunPython(fill_account_balances, migrations.RunPython.noop),
+    ]
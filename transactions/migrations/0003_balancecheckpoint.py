@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 18:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_account_unique_together'),
+        ('transactions', '0002_transaction_account_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datetime', models.DateTimeField()),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('account', models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, to='accounts.account')),
+            ],
+            options={
+                'unique_together': {('account', 'datetime')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 18:18
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_scheduled(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Transaction.objects.filter(datetime__gt=timezone.now()).update(scheduled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='scheduled',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(fill_scheduled, migrations.RunPython.noop),
+    ]
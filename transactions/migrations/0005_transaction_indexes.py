@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_account_balances'),
+        ('transactions', '0004_transaction_scheduled'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'datetime', 'id'], name='transaction_account_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('scheduled', True)), fields=['datetime'], name='transaction_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0 on 2026-10-18 18:46
+
+import django.db.models.deletion
+import transactions.models
+from django.db import migrations, models
+
+
+def create_search(apps, schema_editor):
+    # an fts5 table on sqlite, filled from the existing rows, other backends
+    # search by trigram similarity instead
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE "transactions_transaction_search" USING fts5('
+        'name, description, account, tags, '
+        "tokenize = 'unicode61 remove_diacritics 2');"
+    )
+    schema_editor.execute(
+        'INSERT INTO "transactions_transaction_search" '
+        '(rowid, name, description, account, tags) '
+        'SELECT t."id", t."name", t."description", a."name", COALESCE(('
+        'SELECT group_concat(g."name", \' \') FROM "tags_tag" g '
+        'INNER JOIN "tags_tag_transaction_set" x ON x."tag_id" = g."id" '
+        'WHERE x."transaction_id" = t."id"), \'\') '
+        'FROM "transactions_transaction" t '
+        'INNER JOIN "accounts_account" a ON a."id" = t."account_id";'
+    )
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE "transactions_transaction_search";')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0003_tag_transaction_set_index'),
+        ('transactions', '0005_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='transactions.transaction')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('account', models.TextField()),
+                ('tags', models.TextField()),
+                ('document', transactions.models.SearchField(db_column='transactions_transaction_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'transactions_transaction_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0 on 2026-10-18 18:55
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_local_parts(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    fields = ['local_month', 'local_day', 'local_hour']
+    batch = []
+    for row in Transaction.objects.only('datetime').iterator(chunk_size=1000):
+        local = timezone.localtime(row.datetime, timezone.get_default_timezone())
+        row.local_month, row.local_day, row.local_hour = local.month, local.day, local.hour
+        batch.append(row)
+        if len(batch) >= 1000:
+            Transaction.objects.bulk_update(batch, fields)
+            batch = []
+    Transaction.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_account_balances'),
+        ('transactions', '0006_transactionsearch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='local_day',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='local_hour',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='local_month',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_local_parts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['local_month', 'local_day'], name='transaction_local_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['local_day'], name='transaction_local_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['local_hour'], name='transaction_local_hour_idx'),
+        ),
+    ]
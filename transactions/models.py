@@ -2,10 +2,22 @@ from decimal import Decimal
 from enum import StrEnum
 from typing import Any
 
-from django.db import models
-from django.db.models import Case, F, OuterRef, Q, Sum, Value, When, Window
-from django.db.models.functions import Coalesce
-from django.db.models.query import QuerySet
+from django.conf import settings
+from django.db import connections, models, router
+from django.db import transaction as db_transaction
+from django.db.models import (
+    Case,
+    F,
+    OuterRef,
+    Q,
+    RowRange,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models.query import ModelIterable, QuerySet
 from django.utils import timezone
 
 
@@ -14,7 +26,128 @@ class TransactionOperation(StrEnum):
     CREDIT = "CREDIT"
 
 
-class TransactionManager(models.Manager):
+class TransactionBalanceMode(StrEnum):
+    STORED = "stored"
+    WINDOW = "window"
+    SUBQUERY = "subquery"
+
+
+class TransactionQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._window_balances = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._window_balances = self._window_balances
+        return clone
+
+    def _fetch_all(self):
+        populate = self._result_cache is None and self._window_balances
+        super()._fetch_all()
+        if populate and self._iterable_class is ModelIterable:
+            self.set_window_balances(self._result_cache)  # type: ignore[arg-type]
+
+    def only(self, *fields: str):
+        # the window balances are computed from the account and amount
+        if self._window_balances:
+            fields = (*fields, "account", "amount")
+        return super().only(*fields)
+
+    def before(self, datetime: Any, pk: Any = None):
+        # rows strictly before the (datetime, id) position, a missing pk means
+        # the position is after every existing row sharing the same datetime
+        if pk is None:
+            return self.filter(datetime__lte=datetime)
+        return self.filter(Q(datetime__lt=datetime) | Q(datetime=datetime, pk__lt=pk))
+
+    def after(self, datetime: Any, pk: Any):
+        # rows strictly after the (datetime, id) position
+        return self.filter(Q(datetime__gt=datetime) | Q(datetime=datetime, pk__gt=pk))
+
+    def since(self, datetime: Any, pk: Any = None):
+        # rows at or after the (datetime, id) position, a missing pk means the
+        # position is before every existing row sharing the same datetime
+        if pk is None:
+            return self.filter(datetime__gte=datetime)
+        return self.filter(Q(datetime__gt=datetime) | Q(datetime=datetime, pk__gte=pk))
+
+    def with_subquery_balances(self):
+        # verification mode, recomputes the running balances with a correlated
+        # subquery per row instead of reading the stored columns
+        fields = dict(
+            computed_old_account_balance=Coalesce(
+                TransactionManager.get_old_transactions(self.model._base_manager.all())
+                .annotate(sum=(Window(Sum("amount"))))
+                .values("sum")[:1],
+                Decimal("0"),
+            ),
+            computed_new_account_balance=F("computed_old_account_balance")
+            + F("amount"),
+        )
+        return self.alias(**fields).annotate(**{k: F(k) for k in fields})
+
+    def with_window_balances(self):
+        # recomputes the running balances of the fetched rows with a single
+        # SUM() OVER (PARTITION BY account ORDER BY datetime, id) scan of their
+        # accounts, filtering and pagination stay on the outer queryset
+        clone = self._chain()
+        clone._window_balances = True
+        return clone
+
+    def with_balances(self, mode: str | None = None):
+        mode = mode or getattr(
+            settings, "TRANSACTION_BALANCE_MODE", TransactionBalanceMode.STORED
+        )
+        if mode == TransactionBalanceMode.WINDOW:
+            return self.with_window_balances()
+        elif mode == TransactionBalanceMode.SUBQUERY:
+            return self.with_subquery_balances()
+        return self
+
+    def set_window_balances(self, rows: list["Transaction"]):
+        if not rows:
+            return
+        running = (
+            self.model._base_manager.filter(
+                account_id__in={row.account_id for row in rows}
+            )
+            .annotate(
+                running_balance=Window(
+                    Sum("amount"),
+                    partition_by=F("account_id"),
+                    order_by=[F("datetime").asc(), F("id").asc()],
+                    frame=RowRange(start=None, end=0),
+                )
+            )
+            .order_by()
+            .values("id", "running_balance")
+        )
+        sql, params = running.query.sql_with_params()
+        ids = [row.pk for row in rows]
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        # wrap the scan so the window sees the whole account before narrowing
+        # it down to the fetched rows
+        sql = (
+            "SELECT {id}, {balance} FROM ({sql}) {alias} WHERE {id} IN ({ids})".format(
+                id=qn("id"),
+                balance=qn("running_balance"),
+                sql=sql,
+                alias=qn("running"),
+                ids=", ".join(["%s"] * len(ids)),
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (*params, *ids))
+            balances = dict(cursor.fetchall())
+        for row in rows:
+            balance = Decimal(str(balances[row.pk])).quantize(Decimal("0.01"))
+            row.computed_new_account_balance = balance
+            row.computed_old_account_balance = balance - row.amount
+
+
+class TransactionManager(models.Manager.from_queryset(TransactionQuerySet)):  # type: ignore[misc]
     @classmethod
     def get_old_transactions(cls, transactions: QuerySet["Transaction"]):
         return (
@@ -31,23 +164,9 @@ class TransactionManager(models.Manager):
 
     def get_queryset(self):
         qs: QuerySet["Transaction"] = super().get_queryset()  # type: ignore
-        # needed to use Window here since apparently doing .values(sum=Sum(...))
-        # adds a group by statement to the query which makes the calc. wrong
-        fields = dict(
-            old_account_balance=Coalesce(
-                self.get_old_transactions(qs)
-                .annotate(sum=(Window(Sum("amount"))))
-                .values("sum"),
-                Decimal("0"),
-            ),
-            new_account_balance=F("old_account_balance") + F("amount"),
-            scheduled=Case(
-                When(
-                    datetime__gt=timezone.now(),
-                    then=True,
-                ),
-                default=False,
-            ),
+        # only aliased so that it can be filtered on, the rows compute their
+        # operation from the amount and nothing is added to the select list
+        return qs.alias(
             operation=Case(
                 When(
                     amount__lt=Decimal("0"),
@@ -56,8 +175,128 @@ class TransactionManager(models.Manager):
                 default=Value(TransactionOperation.CREDIT.value),
             ),
         )
-        qs = qs.alias(**fields).annotate(**{k: F(k) for k in fields})
-        return qs
+
+    def get_balance(
+        self, account_id: Any, datetime: Any, pk: Any = None, exclude: Any = None
+    ):
+        # balance of the account right before the (datetime, id) position
+        rows = self.model._base_manager.filter(account_id=account_id)
+        if exclude is not None:
+            rows = rows.exclude(pk=exclude)
+        last = (
+            rows.before(datetime, pk)
+            .order_by("-datetime", "-id")
+            .values_list("new_account_balance", flat=True)
+            .first()
+        )
+        return last if last is not None else Decimal("0")
+
+    def shift(self, account_id: Any, datetime: Any, pk: Any, amount: Decimal):
+        # moves the stored balances of every row after the (datetime, id)
+        # position by the given amount, the rows before it are left untouched
+        if not amount:
+            return 0
+        return (
+            self.model._base_manager.filter(account_id=account_id)
+            .after(datetime, pk)
+            .update(
+                old_account_balance=F("old_account_balance") + amount,
+                new_account_balance=F("new_account_balance") + amount,
+            )
+        )
+
+    def adjust_account(self, account_id: Any, amount: Decimal, scheduled: bool):
+        # scheduled amounts only count towards the future balance until the
+        # maturation worker moves them into the current balance
+        if not amount:
+            return 0
+        account = self.model._meta.get_field("account").related_model
+        fields = dict(future_balance=F("future_balance") + amount)
+        if not scheduled:
+            fields.update(balance=F("balance") + amount)
+        return account._base_manager.filter(pk=account_id).update(**fields)
+
+    def mature(self, now: Any = None):
+        # moves the amounts of the scheduled rows that are now due from the
+        # future balance into the current balance of their accounts
+        now = now or timezone.now()
+        account = self.model._meta.get_field("account").related_model
+        rows = self.model._base_manager
+        due = list(
+            rows.filter(scheduled=True, datetime__lte=now).values_list("pk", flat=True)
+        )
+        matured = 0
+        for pk in due:
+            with db_transaction.atomic():
+                # claimed by the conditional update, a concurrent worker or a
+                # save that has moved the amount already leaves the row alone,
+                # and the amount is read once the row is claimed
+                if not rows.filter(pk=pk, scheduled=True).update(scheduled=False):
+                    continue
+                account_id, amount = rows.values_list("account_id", "amount").get(pk=pk)
+                account._base_manager.filter(pk=account_id).update(
+                    balance=F("balance") + amount
+                )
+            matured += 1
+        return matured
+
+    def get_next_scheduled(self):
+        return (
+            self.model._base_manager.filter(scheduled=True)
+            .order_by("datetime")
+            .values_list("datetime", flat=True)
+            .first()
+        )
+
+    def rebalance(
+        self,
+        account_id: Any,
+        datetime: Any = None,
+        pk: Any = None,
+        batch_size: int = 1000,
+    ):
+        # recomputes the stored balances of the account starting from the
+        # (datetime, id) position, or from the very first row if not given
+        rows = self.model._base_manager.filter(account_id=account_id)
+        balance = Decimal("0")
+        if datetime is not None:
+            start = (
+                rows.filter(datetime__lt=datetime)
+                if pk is None
+                else rows.before(datetime, pk)
+            )
+            last = (
+                start.order_by("-datetime", "-id")
+                .values_list("new_account_balance", flat=True)
+                .first()
+            )
+            balance = last if last is not None else balance
+            rows = rows.since(datetime, pk)
+        batch: list[Transaction] = []
+        for row in (
+            rows.order_by("datetime", "id")
+            .only("amount")
+            .iterator(chunk_size=batch_size)
+        ):
+            row.old_account_balance = balance
+            row.new_account_balance = balance = balance + row.amount
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.model._base_manager.bulk_update(
+                    batch, ["old_account_balance", "new_account_balance"]
+                )
+                batch = []
+        if batch:
+            self.model._base_manager.bulk_update(
+                batch, ["old_account_balance", "new_account_balance"]
+            )
+        if datetime is None:
+            BalanceCheckpoint.objects.rebuild(account_id)
+        else:
+            BalanceCheckpoint.objects.invalidate(account_id, datetime)
+        account = self.model._meta.get_field("account").related_model
+        account.objects.refresh_balances(account_id)
+        return balance
 
 
 class Transaction(models.Model):
@@ -65,6 +304,26 @@ class Transaction(models.Model):
 
     class Meta:
         base_manager_name = "objects"
+        indexes = [
+            # every listing and running balance lookup filters on the account
+            # and walks the (datetime, id) order
+            models.Index(
+                fields=["account", "datetime", "id"],
+                name="transaction_account_order_idx",
+            ),
+            # the calendar filters on the month (and day), the day and the hour
+            models.Index(
+                fields=["local_month", "local_day"], name="transaction_local_month_idx"
+            ),
+            models.Index(fields=["local_day"], name="transaction_local_day_idx"),
+            models.Index(fields=["local_hour"], name="transaction_local_hour_idx"),
+            # the few future-dated rows the maturation worker polls
+            models.Index(
+                fields=["datetime"],
+                condition=Q(scheduled=True),
+                name="transaction_scheduled_idx",
+            ),
+        ]
 
     def auto_now_add():  # type: ignore
         return timezone.now()
@@ -76,10 +335,275 @@ class Transaction(models.Model):
     datetime = models.DateTimeField(blank=True, default=auto_now_add)
     name = models.CharField(blank=True, max_length=50, default="")
     description = models.TextField(blank=True, max_length=250, default="")
+    # running balances of the account before and after this transaction,
+    # maintained incrementally on save and delete
+    old_account_balance = models.DecimalField(
+        editable=False, max_digits=18, decimal_places=2, default=Decimal(0)
+    )
+    new_account_balance = models.DecimalField(
+        editable=False, max_digits=18, decimal_places=2, default=Decimal(0)
+    )
+
+    # whether the transaction still counts only towards the future balance of
+    # the account, cleared by the maturation worker once it is due
+    scheduled = models.BooleanField(default=False, editable=False)
+    # the local calendar parts of the datetime, the calendar filters compare
+    # them instead of converting every row to the local time zone, the year
+    # is already a datetime range
+    local_month = models.PositiveSmallIntegerField(default=0, editable=False)
+    local_day = models.PositiveSmallIntegerField(default=0, editable=False)
+    local_hour = models.PositiveSmallIntegerField(default=0, editable=False)
 
     tag_set: QuerySet[Any]
 
-    old_account_balance = Decimal("0")
-    new_account_balance = Decimal("0")
-    scheduled = False
-    operation = TransactionOperation = TransactionOperation.CREDIT
+    # columns the properties below are computed from
+    derived_fields = dict(operation=("amount",), scheduled=("datetime",))
+
+    @property
+    def is_scheduled(self):
+        # whether the row is still future-dated, the stored flag only tells
+        # whether the maturation worker has moved its amount yet
+        return self.datetime > timezone.now()
+
+    @property
+    def operation(self):
+        if self.amount is not None and self.amount < 0:
+            return TransactionOperation.DEBIT
+        return TransactionOperation.CREDIT
+
+    def set_local_parts(self):
+        local = timezone.localtime(self.datetime, timezone.get_default_timezone())
+        self.local_month = local.month
+        self.local_day = local.day
+        self.local_hour = local.hour
+
+    def save(self, *args, **kwargs):
+        manager: TransactionManager = type(self).objects
+        with db_transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    type(self)
+                    ._base_manager.filter(pk=self.pk)
+                    .values("account_id", "datetime", "amount", "scheduled")
+                    .first()
+                )
+            if previous:
+                # take the row out of its old position first
+                manager.shift(
+                    previous["account_id"],
+                    previous["datetime"],
+                    self.pk,
+                    -previous["amount"],
+                )
+                manager.adjust_account(
+                    previous["account_id"], -previous["amount"], previous["scheduled"]
+                )
+            amount = Decimal(self.amount or 0)
+            self.scheduled = self.datetime > timezone.now()
+            self.set_local_parts()
+            self.old_account_balance = manager.get_balance(
+                self.account_id, self.datetime, self.pk, exclude=self.pk
+            )
+            self.new_account_balance = self.old_account_balance + amount
+            rv = super().save(*args, **kwargs)
+            manager.shift(self.account_id, self.datetime, self.pk, amount)
+            manager.adjust_account(self.account_id, amount, self.scheduled)
+
+            checkpoints = {self.account_id: self.datetime}
+            if previous:
+                pid, pdatetime = previous["account_id"], previous["datetime"]
+                checkpoints[pid] = min(checkpoints.get(pid, pdatetime), pdatetime)
+            for account_id, datetime in checkpoints.items():
+                BalanceCheckpoint.objects.invalidate(account_id, datetime)
+        return rv
+
+    def delete(self, *args, **kwargs):
+        manager: TransactionManager = type(self).objects
+        with db_transaction.atomic():
+            previous = (
+                type(self)
+                ._base_manager.filter(pk=self.pk)
+                .values("account_id", "datetime", "amount", "scheduled")
+                .first()
+            )
+            if previous:
+                manager.shift(
+                    previous["account_id"],
+                    previous["datetime"],
+                    self.pk,
+                    -previous["amount"],
+                )
+                manager.adjust_account(
+                    previous["account_id"], -previous["amount"], previous["scheduled"]
+                )
+            pk = self.pk
+            rv = super().delete(*args, **kwargs)
+            TransactionSearch.objects.remove([pk])
+            if previous:
+                BalanceCheckpoint.objects.invalidate(
+                    previous["account_id"], previous["datetime"]
+                )
+        return rv
+
+
+def month_start(value: Any, months: int = 0):
+    # start of the local calendar month containing the datetime, optionally
+    # moved by a number of months
+    local = timezone.localtime(value, timezone.get_default_timezone())
+    index = local.year * 12 + local.month - 1 + months
+    return local.replace(
+        year=index // 12,
+        month=index % 12 + 1,
+        day=1,
+        hour=0,
+        minute=0,
+        second=0,
+        microsecond=0,
+    )
+
+
+class BalanceCheckpointManager(models.Manager):
+    def rebuild(self, account_id: Any, datetime: Any = None):
+        # recreates the closing balances of every closed month of the account
+        # starting from the month containing the datetime, or from scratch
+        rows = Transaction._base_manager.filter(account_id=account_id)
+        checkpoints = self.filter(account_id=account_id)
+        if datetime is not None:
+            checkpoints = checkpoints.filter(datetime__gt=datetime)
+        checkpoints.delete()
+
+        latest = self.filter(account_id=account_id).order_by("-datetime").first()
+        balance = latest.balance if latest else Decimal("0")
+        if latest:
+            rows = rows.filter(datetime__gte=latest.datetime)
+        current = month_start(timezone.now())
+        months = (
+            rows.filter(datetime__lt=current)
+            .order_by()
+            .values(
+                month=TruncMonth("datetime", tzinfo=timezone.get_default_timezone())
+            )
+            .annotate(total=Sum("amount"))
+            .order_by("month")
+        )
+        created = []
+        for month in months:
+            balance = (balance + Decimal(month["total"])).quantize(Decimal("0.01"))
+            created.append(
+                self.model(
+                    account_id=account_id,
+                    datetime=month_start(month["month"], 1),
+                    balance=balance,
+                )
+            )
+        # the current month gets its opening checkpoint even when the account
+        # had no rows lately, the lookups would otherwise rebuild every time
+        last = created[-1].datetime if created else latest and latest.datetime
+        if last is None or last < current:
+            created.append(
+                self.model(account_id=account_id, datetime=current, balance=balance)
+            )
+        # the lookups of concurrent requests may rebuild the same months
+        return self.bulk_create(created, ignore_conflicts=True)
+
+    def invalidate(self, account_id: Any, datetime: Any):
+        # checkpoints closing after a back-dated change no longer hold
+        if self.filter(account_id=account_id, datetime__gt=datetime).exists():
+            self.rebuild(account_id, datetime)
+
+    def refresh(self, account_id: Any):
+        # appends the checkpoints of the months closed since the latest one
+        latest = self.filter(account_id=account_id).order_by("-datetime").first()
+        if latest is None or latest.datetime < month_start(timezone.now()):
+            self.rebuild(account_id, latest.datetime if latest else None)
+
+    def get_balance(self, account_id: Any, datetime: Any):
+        # balance of the account as of the datetime, starting from the nearest
+        # checkpoint and summing only the rows after it
+        self.refresh(account_id)
+        rows = Transaction._base_manager.filter(
+            account_id=account_id, datetime__lte=datetime
+        )
+        balance = Decimal("0")
+        checkpoint = (
+            self.filter(account_id=account_id, datetime__lte=datetime)
+            .order_by("-datetime")
+            .first()
+        )
+        if checkpoint:
+            balance = checkpoint.balance
+            rows = rows.filter(datetime__gte=checkpoint.datetime)
+        total = rows.order_by().aggregate(total=Sum("amount"))["total"]
+        return (balance + Decimal(total or 0)).quantize(Decimal("0.01"))
+
+
+class BalanceCheckpoint(models.Model):
+    objects = BalanceCheckpointManager()
+
+    class Meta:
+        unique_together = (("account", "datetime"),)
+
+    account = models.ForeignKey("accounts.Account", models.CASCADE, default=None)
+    # exclusive end of the closed month, i.e. the start of the next month
+    datetime = models.DateTimeField()
+    balance = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal(0))
+
+
+class SearchField(models.TextField):
+    # the hidden column of an fts5 table that is named after the table itself,
+    # matching it searches every column of the row
+    pass
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler: Any, connection: Any):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+# index rows removed per statement, below the parameter limit of sqlite
+SEARCH_CHUNK_SIZE = 500
+
+
+class TransactionSearchManager(models.Manager):
+    def remove(self, pks: Any):
+        # drops the index rows of the deleted transactions, given by their
+        # primary keys or by a values("pk") queryset of them, one statement
+        # per chunk instead of the deletion signals of every row
+        if connections[router.db_for_write(self.model)].vendor != "sqlite":
+            return
+        if isinstance(pks, QuerySet):
+            self.filter(pk__in=pks).delete()
+            return
+        pks = list(pks)
+        for start in range(0, len(pks), SEARCH_CHUNK_SIZE):
+            self.filter(pk__in=pks[start : start + SEARCH_CHUNK_SIZE]).delete()
+
+
+class TransactionSearch(models.Model):
+    # the sqlite fts5 index of the searchable text of the transactions, only
+    # read and deleted through the ORM, transactions.search writes its rows
+    objects = TransactionSearchManager()
+
+    transaction = models.OneToOneField(
+        Transaction,
+        models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        related_name="search",
+    )
+    name = models.TextField()
+    description = models.TextField()
+    account = models.TextField()
+    tags = models.TextField()
+    document = SearchField(db_column="transactions_transaction_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "transactions_transaction_search"
@@ -1,14 +1,18 @@
 from typing import Any
 
+from django.db import transaction as db_transaction
 from django.forms import ModelForm
 from graphene import (
     ID,
     Boolean,
+    DateTime,
     Decimal,
     Enum,
     Field,
     InputObjectType,
+    Int,
     List,
+    Mutation,
     NonNull,
     ObjectType,
     String,
@@ -23,6 +27,7 @@ from graphql_jwt.decorators import login_required
 
 from accounts.models import Account
 from tags.models import Tag
+from transactions.batches import TransactionBatch
 from transactions.filters import TransactionFilter
 from transactions.forms import (
     CreateTransactionForm,
@@ -30,14 +35,21 @@ from transactions.forms import (
     OrderTransactionForm,
     UpdateTransactionForm,
 )
+from transactions.imports import ImportFormat as OriginalImportFormat
+from transactions.imports import TransactionImporter, read_rows
 from transactions.models import Transaction
 from transactions.models import TransactionOperation as OriginalTransactionOperation
+from transactions.search import search
 from utils import filter_order_paginate
 from utils.filter import filter_to_filter_input_class
 from utils.order import form_to_order_argument
 from utils.paginator import PaginatorQueryInput, PaginatorQueryPayload
+from utils.planner import plan
+from utils.selection import selects
+from utils.upload import Upload
 
 TransactionOperation = Enum.from_enum(OriginalTransactionOperation)
+ImportFormat = Enum.from_enum(OriginalImportFormat)
 
 
 class TransactionType(DjangoObjectType):
@@ -60,21 +72,37 @@ class TransactionType(DjangoObjectType):
 
     @staticmethod
     def resolve_new_account_balance(parent: Transaction, info):
-        return parent.new_account_balance
+        # prefer the recomputed balances of the window and subquery modes
+        return getattr(
+            parent, "computed_new_account_balance", parent.new_account_balance
+        )
 
     @staticmethod
     def resolve_old_account_balance(parent: Transaction, info):
-        return parent.old_account_balance
+        return getattr(
+            parent, "computed_old_account_balance", parent.old_account_balance
+        )
 
     @staticmethod
     def resolve_scheduled(parent: Transaction, info):
-        return parent.scheduled
+        # like the scheduled filter, by the datetime
+        return parent.is_scheduled
 
     @staticmethod
     def resolve_operation(parent: Transaction, info):
         return parent.operation
 
 
+def with_balances(queryset: Any, info: Any):
+    # the recomputed balances of the window and subquery modes are only
+    # attached when the payload rows select them
+    if selects(info, "data", "oldAccountBalance") or selects(
+        info, "data", "newAccountBalance"
+    ):
+        return queryset.with_balances()
+    return queryset
+
+
 # queries
 class GetTransactionQueryInput(InputObjectType):
     id = ID(required=True)
@@ -102,11 +130,16 @@ class TransactionQuery(ObjectType):
         order=form_to_order_argument(OrderTransactionForm),
         paginator=PaginatorQueryInput(),
     )
+    search_transactions = Field(
+        ListTransactionsQueryPayload,
+        query=String(required=True),
+        paginator=PaginatorQueryInput(),
+    )
 
     @staticmethod
     @login_required
     def resolve_get_transaction(root, info, input: GetTransactionQueryInput):
-        data = Transaction._default_manager.get(
+        data = plan(with_balances(Transaction.objects.all(), info), info).get(
             pk=input.id, account__currency__user=info.context.user
         )
         return GetTransactionQueryPayload(data=data)  # type: ignore
@@ -120,68 +153,31 @@ class TransactionQuery(ObjectType):
         order: list[Any] | None = None,
         paginator: PaginatorQueryInput | None = None,
     ):
-        data = Transaction._default_manager.filter(
+        data = with_balances(Transaction.objects.all(), info).filter(
             account__currency__user=info.context.user
         )
-        data, kwargs = filter_order_paginate(data, filter, order, paginator)
+        data, kwargs = filter_order_paginate(data, filter, order, paginator, info)
         return ListTransactionsQueryPayload(data=data, **kwargs)  # type: ignore
 
-
-def unique(values: list[str]):
-    for idx in range(len(values) - 1, -1, -1):
-        t = values[idx]
-        if t in values[:idx]:
-            values.pop(idx)
-    return values
-
-
-def tag(transaction: Transaction, tags: list[str], tag_ids: list[str]):
-    unique(tags)
-    unique(tag_ids)
-
-    existing_tags = []
-    new_tags = []
-
-    for t in tags:
-        tg = Tag._default_manager.filter(
-            user=transaction.account.currency.user, name=t
-        ).first()
-        if tg:
-            existing_tags.append(tg)
-        elif t.strip():
-            new_tags.append(Tag(user=transaction.account.currency.user, name=t))
-    for t in tag_ids:
-        tg = Tag._default_manager.filter(
-            user=transaction.account.currency.user, pk=t
-        ).first()
-        if tg:
-            existing_tags.append(tg)
-    new_tags = Tag.objects.bulk_create(new_tags)
-    transaction.tag_set.add(*existing_tags, *new_tags)  # type: ignore
-
-
-def untag(transaction: Transaction, tags: list[str], tag_ids: list[str]):
-    unique(tags)
-    unique(tag_ids)
-
-    existing_tags = []
-    for t in tags:
-        tg = Tag._default_manager.filter(
-            user=transaction.account.currency.user, name=t
-        ).first()
-        if tg:
-            existing_tags.append(tg)
-    for t in tag_ids:
-        tg = Tag._default_manager.filter(
-            user=transaction.account.currency.user, pk=t
-        ).first()
-        if tg:
-            existing_tags.append(tg)
-    transaction.tag_set.remove(*existing_tags)  # type: ignore
+    @staticmethod
+    @login_required
+    def resolve_search_transactions(
+        root, info, query: str, paginator: PaginatorQueryInput | None = None
+    ):
+        # ranked best match first, paginated by page numbers
+        data = with_balances(Transaction.objects.all(), info).filter(
+            account__currency__user=info.context.user
+        )
+        data = search(data, query)
+        data, kwargs = filter_order_paginate(data, None, None, paginator, info)
+        return ListTransactionsQueryPayload(data=data, **kwargs)  # type: ignore
 
 
 # mutations
 class BaseTransactionMutation(DjangoModelFormMutation):
+    # models whose cached list counts the mutation invalidates
+    invalidates = (Transaction, Tag)
+
     class Meta:
         abstract = True
 
@@ -195,7 +191,10 @@ class BaseTransactionMutation(DjangoModelFormMutation):
     def check_user(cls, info, **input):
         pk = input.get("account", None)
         if pk:
-            return Account.objects.get(pk=pk, currency__user=info.context.user)
+            # ownership check, no balances or annotations are selected
+            return Account._base_manager.only("pk").get(
+                pk=pk, currency__user=info.context.user
+            )
         return True
 
 
@@ -220,7 +219,7 @@ class CreateTransactionMutation(BaseTransactionMutation):
 
         if form.is_valid():
             rv = cls.perform_mutate(form, info)
-            tag(form.instance, tags, tag_ids)
+            Tag.objects.link(info.context.user, [(form.instance, tags, tag_ids)])
             return rv
         else:
             errors = ErrorType.from_errors(form.errors)
@@ -231,8 +230,7 @@ class CreateTransactionMutation(BaseTransactionMutation):
     @classmethod
     def perform_mutate(cls, form: ModelForm, info):
         obj: Transaction = form.save()
-        # explicitly re-fetched using .get since the annotations only exist
-        # at the manager level (.objects)
+        # re-fetched with the balances the save stored on the other rows
         kwargs = {cls._meta.return_field_name: Transaction.objects.get(pk=obj.pk)}
         return cls(errors=[], **kwargs)
 
@@ -244,7 +242,7 @@ class ExistingTransactionMutation(BaseTransactionMutation):
     @classmethod
     def get_form_kwargs(cls, root, info, **input):
         kwargs = super().get_form_kwargs(root, info, **input)
-        cls._meta.model._default_manager.filter(
+        cls._meta.model._base_manager.only("pk").filter(
             account__currency__user=info.context.user
         ).get(
             pk=kwargs["instance"].pk  # type: ignore
@@ -280,8 +278,12 @@ class UpdateTransactionMutation(ExistingTransactionMutation):
 
         if form.is_valid():
             rv = cls.perform_mutate(form, info)
-            untag(form.instance, remove_tags, remove_tag_ids)
-            tag(form.instance, add_tags, add_tag_ids)
+            Tag.objects.unlink(
+                info.context.user, [(form.instance, remove_tags, remove_tag_ids)]
+            )
+            Tag.objects.link(
+                info.context.user, [(form.instance, add_tags, add_tag_ids)]
+            )
             return rv
         else:
             errors = ErrorType.from_errors(form.errors)
@@ -308,7 +310,137 @@ class DeleteTransactionMutation(ExistingTransactionMutation):
         return cls(errors=[], **kwargs)  # type: ignore
 
 
+class RowErrorType(ObjectType):
+    row = Int(required=True)
+    field = String(required=True)
+    messages = List(NonNull(String), required=True)
+
+
+class ImportTransactionsMutation(Mutation):
+    invalidates = (Transaction, Tag)
+
+    class Arguments:
+        file = Upload(required=True)
+        # guessed from the file name when omitted
+        format = ImportFormat()
+
+    count = Int(required=True)
+    errors = List(NonNull(RowErrorType), required=True)
+
+    @staticmethod
+    @login_required
+    def mutate(root, info, file: Any, format: Any = None):
+        importer = TransactionImporter(info.context.user).run(
+            read_rows(file, OriginalImportFormat(format) if format else None)
+        )
+        return ImportTransactionsMutation(count=importer.count, errors=importer.errors)  # type: ignore
+
+
+class CreateTransactionsInput(InputObjectType):
+    account = ID(required=True)
+    amount = Decimal()
+    datetime = DateTime()
+    name = String()
+    description = String()
+    tags = List(NonNull(String))
+    tag_ids = List(NonNull(ID))
+
+
+class UpdateTransactionsInput(InputObjectType):
+    id = ID(required=True)
+    account = ID()
+    amount = Decimal()
+    datetime = DateTime()
+    name = String()
+    description = String()
+    add_tags = List(NonNull(String))
+    add_tag_ids = List(NonNull(ID))
+    remove_tags = List(NonNull(String))
+    remove_tag_ids = List(NonNull(ID))
+
+
+class BatchTransactionsMutation(Mutation):
+    # errors point at the index of the input row, nothing is written unless
+    # every row is valid
+    invalidates = (Transaction, Tag)
+
+    class Meta:
+        abstract = True
+
+    data = List(NonNull(TransactionType), required=True)
+    errors = List(NonNull(RowErrorType), required=True)
+
+    @classmethod
+    def payload(cls, info, batch: TransactionBatch, data: list[Transaction]):
+        if batch.errors:
+            _set_errors_flag_to_context(info)
+        return cls(data=data, errors=batch.errors)  # type: ignore
+
+
+class CreateTransactionsMutation(BatchTransactionsMutation):
+    class Arguments:
+        input = List(NonNull(CreateTransactionsInput), required=True)
+
+    @classmethod
+    @login_required
+    def mutate(cls, root, info, input: list[Any]):
+        batch = TransactionBatch(info.context.user)
+        with db_transaction.atomic():
+            data = batch.create(input)
+            Tag.objects.link(
+                info.context.user,
+                (
+                    (row, i.get("tags") or [], i.get("tag_ids") or [])
+                    for row, i in zip(data, input)
+                ),
+            )
+        return cls.payload(info, batch, data)
+
+
+class UpdateTransactionsMutation(BatchTransactionsMutation):
+    class Arguments:
+        input = List(NonNull(UpdateTransactionsInput), required=True)
+
+    @classmethod
+    @login_required
+    def mutate(cls, root, info, input: list[Any]):
+        batch = TransactionBatch(info.context.user)
+        with db_transaction.atomic():
+            data = batch.update(input)
+            Tag.objects.unlink(
+                info.context.user,
+                (
+                    (row, i.get("remove_tags") or [], i.get("remove_tag_ids") or [])
+                    for row, i in zip(data, input)
+                ),
+            )
+            Tag.objects.link(
+                info.context.user,
+                (
+                    (row, i.get("add_tags") or [], i.get("add_tag_ids") or [])
+                    for row, i in zip(data, input)
+                ),
+            )
+        return cls.payload(info, batch, data)
+
+
+class DeleteTransactionsMutation(BatchTransactionsMutation):
+    class Arguments:
+        ids = List(NonNull(ID), required=True)
+
+    @classmethod
+    @login_required
+    def mutate(cls, root, info, ids: list[Any]):
+        batch = TransactionBatch(info.context.user)
+        data = batch.delete(ids)
+        return cls.payload(info, batch, data)
+
+
 class TransactionMutation(ObjectType):
     create_transaction = CreateTransactionMutation.Field()
     update_transaction = UpdateTransactionMutation.Field()
     delete_transaction = DeleteTransactionMutation.Field()
+    import_transactions = ImportTransactionsMutation.Field()
+    create_transactions = CreateTransactionsMutation.Field()
+    update_transactions = UpdateTransactionsMutation.Field()
+    delete_transactions = DeleteTransactionsMutation.Field()
@@ -0,0 +1,120 @@
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from django.db import connections, models, router
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from transactions.models import Transaction, TransactionSearch
+
+# rows written per statement when indexing
+CHUNK_SIZE = 500
+# minimum trigram word similarity of the rows matched on other backends
+SIMILARITY = 0.3
+# best ranked first, the latest rows break the ties
+ORDERING = ("search_rank", "-datetime", "-id")
+
+
+def connection():
+    return connections[router.db_for_write(Transaction)]
+
+
+def index(pks: Iterable[Any]):
+    # rewrites the index rows of the transactions from their current name,
+    # description, account name and tags, the deleted ones are dropped
+    db = connection()
+    if db.vendor != "sqlite":
+        return
+    pks = list(dict.fromkeys(pks))
+    tag = Transaction._meta.get_field("tag")
+    tables = {
+        name: db.ops.quote_name(model._meta.db_table)
+        for name, model in (
+            ("search", TransactionSearch),
+            ("transaction", Transaction),
+            ("account", Transaction._meta.get_field("account").related_model),
+            ("tag", tag.related_model),
+            ("through", tag.through),  # type: ignore[union-attr]
+        )
+    }
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start : start + CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        with db.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM {search} WHERE rowid IN ({pks})".format(
+                    pks=placeholders, **tables
+                ),
+                chunk,
+            )
+            cursor.execute(
+                "INSERT INTO {search} (rowid, name, description, account, tags) "
+                "SELECT t.id, t.name, t.description, a.name, COALESCE(("
+                "SELECT group_concat(g.name, ' ') FROM {tag} g "
+                "INNER JOIN {through} x ON x.tag_id = g.id "
+                "WHERE x.transaction_id = t.id), '') "
+                "FROM {transaction} t INNER JOIN {account} a ON a.id = t.account_id "
+                "WHERE t.id IN ({pks})".format(pks=placeholders, **tables),
+                chunk,
+            )
+
+
+def rename_account(account_id: Any, name: str):
+    # the account name is copied into every index row of its transactions
+    db = connection()
+    if db.vendor != "sqlite":
+        return
+    table = db.ops.quote_name(TransactionSearch._meta.db_table)
+    rows = Transaction._base_manager.filter(account_id=account_id).values("pk")
+    sql, params = rows.query.sql_with_params()
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET account = %s WHERE rowid IN ({sql})",
+            (name, *params),
+        )
+
+
+def match_query(query: str):
+    # every word of the query has to start a word of the row, e.g. "groc jan"
+    # becomes "groc"* "jan"*, quoted so that no fts5 syntax gets through
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def search(queryset: models.QuerySet[Transaction], query: str):
+    # the rows matching the query with their search_rank, lower is better,
+    # ranked by bm25 on sqlite and by trigram word similarity elsewhere
+    if connections[queryset.db].vendor != "sqlite":
+        return trigram_search(queryset, query)
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    return (
+        queryset.filter(search__document__match=match)
+        .alias(search_rank=F("search__rank"))
+        .order_by(*ORDERING)
+    )
+
+
+def trigram_search(queryset: models.QuerySet[Transaction], query: str):
+    # needs the pg_trgm extension the migration installs on postgresql
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    through = Transaction._meta.get_field("tag").through  # type: ignore[union-attr]
+    tags = (
+        through.objects.filter(transaction_id=OuterRef("pk"))
+        .annotate(similarity=TrigramWordSimilarity(Value(query), "tag__name"))
+        .order_by("-similarity")
+        .values("similarity")[:1]
+    )
+    similarity = Greatest(
+        TrigramWordSimilarity(Value(query), "name"),
+        TrigramWordSimilarity(Value(query), "description"),
+        TrigramWordSimilarity(Value(query), "account__name"),
+        Coalesce(Subquery(tags), Value(0.0), output_field=FloatField()),
+    )
+    return (
+        queryset.alias(search_rank=-similarity)
+        .filter(search_rank__lte=-SIMILARITY)
+        .order_by(*ORDERING)
+    )
@@ -0,0 +1,67 @@
+from typing import Any
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import Account
+from tags.models import Tag
+from transactions import search
+from transactions.models import Transaction, TransactionSearch
+
+# keeps the search index of the transactions in sync with the single row
+# writes, the bulk writes of the batches, imports and tag links index the
+# rows they touch themselves. The deletions remove the index rows in bulk,
+# Transaction has no deletion receivers so that the cascades stay set-based.
+
+
+@receiver(post_save, sender=Transaction)
+def index_transaction(sender: Any, instance: Transaction, **kwargs: Any):
+    search.index([instance.pk])
+
+
+@receiver(pre_delete, sender=Account)
+def unindex_account(sender: Any, instance: Account, **kwargs: Any):
+    # the transactions of the account, and of its currency and user, are
+    # deleted by cascade
+    TransactionSearch.objects.remove(
+        Transaction._base_manager.filter(account=instance).values("pk")
+    )
+
+
+@receiver(post_save, sender=Account)
+def index_account(sender: Any, instance: Account, created: bool, **kwargs: Any):
+    if not created:
+        search.rename_account(instance.pk, instance.name)
+
+
+@receiver(post_save, sender=Tag)
+def index_tag(sender: Any, instance: Tag, created: bool, **kwargs: Any):
+    if not created:
+        search.index(instance.transaction_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def collect_tag(sender: Any, instance: Tag, **kwargs: Any):
+    # the links are gone by the time the tag is deleted
+    instance._search_pks = list(instance.transaction_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_tag(sender: Any, instance: Tag, **kwargs: Any):
+    search.index(getattr(instance, "_search_pks", []))
+
+
+@receiver(m2m_changed, sender=Tag.transaction_set.through)
+def index_links(
+    sender: Any, instance: Any, action: str, reverse: bool, pk_set: Any, **kwargs: Any
+):
+    if action == "pre_clear" and isinstance(instance, Tag):
+        # the links are gone after the clear
+        instance._search_pks = list(
+            instance.transaction_set.values_list("pk", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if isinstance(instance, Transaction):
+            search.index([instance.pk])
+        else:
+            search.index(pk_set if pk_set is not None else instance._search_pks)
@@ -1,3 +1,1224 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import random
+import re
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from typing import Any
+from unittest import mock
 
-# Create your tests here.
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Account
+from authentication.tests import TestAuth
+from currencies.models import Currency
+from tags.models import Tag
+from thriftease_api.tests import TestGraphQL
+from transactions.batches import TransactionBatch
+from transactions.gql import TransactionSchema
+from transactions.models import BalanceCheckpoint, Transaction, TransactionSearch
+from transactions.schemas import TransactionFilterQueryInput
+from users.models import User
+from utils import ObjectDict, filter_order_paginate
+from utils.counts import cached_count
+from utils.gql import GqlAction, GqlArgument, GqlType
+from utils.metrics import SECONDS, registry
+from utils.paginator import CursorPaginatorType, PaginatorQueryInput
+from utils.upload import Upload
+
+props = ObjectDict(
+    email="test@email.com",
+    password="@Password1234",
+    given_name="Test",
+    family_name="User",
+)
+# pinned queries of the mutations, tags and search index included
+QUERIES = dict(createTransaction=20, updateTransaction=25)
+
+
+def create_ledger(**kwargs: Any):
+    user = User.objects.filter(email=props.email).first() or User(**props)
+    user.save()
+    currency, _ = Currency.objects.get_or_create(
+        user=user, abbreviation="php", defaults=dict(symbol="P", name="Peso")
+    )
+    account = Account(currency=currency, name=kwargs.get("name", "Wallet"))
+    account.save()
+    return user, currency, account
+
+
+def assert_balances(account: Account):
+    rows = (
+        Transaction.objects.filter(account=account)
+        .with_subquery_balances()
+        .order_by("datetime", "id")
+    )
+    cent = Decimal("0.01")
+    balance = Decimal("0")
+    for row in rows:
+        computed = Decimal(row.computed_old_account_balance).quantize(cent)
+        assert row.old_account_balance == computed == balance
+        balance += row.amount
+        computed = Decimal(row.computed_new_account_balance).quantize(cent)
+        assert row.new_account_balance == computed == balance
+
+
+def assert_account_balances(account: Account):
+    account.refresh_from_db()
+    now = timezone.now()
+    rows = list(Transaction.objects.filter(account=account))
+    assert account.future_balance == sum((r.amount for r in rows), Decimal("0"))
+    assert account.balance == sum(
+        (r.amount for r in rows if r.datetime <= now), Decimal("0")
+    )
+
+
+@pytest.mark.django_db
+class TestTransactionModel:
+    def test_balances(self):
+        _, _, account = create_ledger()
+        now = timezone.now()
+        rng = random.Random(0)
+
+        rows = []
+        for _ in range(30):
+            row = Transaction(
+                account=account,
+                amount=Decimal(rng.randint(-5000, 5000)) / 100,
+                datetime=now + timedelta(days=rng.randint(-30, 30)),
+            )
+            row.save()
+            rows.append(row)
+        assert_balances(account)
+
+        # back-dated and moved rows
+        for row in rng.sample(rows, 10):
+            row.amount = Decimal(rng.randint(-5000, 5000)) / 100
+            row.datetime = now + timedelta(days=rng.randint(-60, 60))
+            row.save()
+        assert_balances(account)
+
+        for row in rng.sample(rows, 10):
+            row.delete()
+        assert_balances(account)
+        assert_account_balances(account)
+
+        # moved across accounts
+        _, _, other = create_ledger(name="Bank")
+        for row in Transaction.objects.filter(account=account)[:5]:
+            row.account = other
+            row.save()
+        assert_balances(account)
+        assert_balances(other)
+        assert_account_balances(account)
+        assert_account_balances(other)
+
+    def test_mature(self):
+        _, _, account = create_ledger()
+        now = timezone.now()
+        for minutes, amount in ((-5, "10"), (5, "20"), (10, "30")):
+            Transaction(
+                account=account,
+                amount=Decimal(amount),
+                datetime=now + timedelta(minutes=minutes),
+            ).save()
+        account.refresh_from_db()
+        assert (account.balance, account.future_balance) == (10, 60)
+        assert Transaction.objects.get_next_scheduled() == now + timedelta(minutes=5)
+
+        assert Transaction.objects.mature(now + timedelta(minutes=7)) == 1
+        # a row is only moved once
+        assert Transaction.objects.mature(now + timedelta(minutes=7)) == 0
+        account.refresh_from_db()
+        assert (account.balance, account.future_balance) == (30, 60)
+        assert Transaction.objects.filter(scheduled=True).count() == 1
+
+        call_command("mature_transactions", "--once", stdout=io.StringIO())
+        assert Transaction.objects.mature(now + timedelta(minutes=15)) == 1
+        account.refresh_from_db()
+        assert (account.balance, account.future_balance) == (60, 60)
+
+    def test_rebalance(self):
+        _, _, account = create_ledger()
+        now = timezone.now()
+        rows = Transaction.objects.bulk_create(
+            [
+                Transaction(account=account, amount=Decimal(i), datetime=now)
+                for i in range(1, 6)
+            ]
+        )
+        assert Transaction.objects.rebalance(account.pk) == Decimal("15")
+        assert_balances(account)
+
+        Transaction.objects.filter(pk=rows[2].pk).update(amount=Decimal("10"))
+        Transaction.objects.rebalance(account.pk, rows[2].datetime, rows[2].pk)
+        assert_balances(account)
+
+
+@pytest.mark.django_db
+class TestTransactionBalanceMode:
+    def test_modes(self):
+        user, _, account = create_ledger()
+        _, _, other = create_ledger(name="Bank")
+        now = timezone.now()
+        rng = random.Random(2)
+
+        for acc in (account, other):
+            Transaction.objects.bulk_create(
+                [
+                    Transaction(
+                        account=acc,
+                        amount=Decimal(rng.randint(-5000, 5000)) / 100,
+                        # coarse datetimes so that ties are broken by id
+                        datetime=now - timedelta(days=rng.randint(0, 20)),
+                        name=rng.choice("abc"),
+                    )
+                    for _ in range(rng.randint(20, 40))
+                ]
+            )
+            Transaction.objects.rebalance(acc.pk)
+
+        def page(mode: str, page: int, name: str):
+            data = Transaction.objects.with_balances(mode).filter(
+                account__currency__user=user
+            )
+            filter = TransactionFilterQueryInput._meta.container(
+                dict(name__icontains=name)
+            )
+            paginator = PaginatorQueryInput._meta.container(dict(per_page=7, page=page))
+            data, _ = filter_order_paginate(data, filter, None, paginator)
+            assert all(
+                hasattr(row, "computed_new_account_balance") == (mode != "stored")
+                for row in data
+            )
+            cent = Decimal("0.01")
+            return [
+                (
+                    row.pk,
+                    Decimal(
+                        getattr(
+                            row,
+                            "computed_old_account_balance",
+                            row.old_account_balance,
+                        )
+                    ).quantize(cent),
+                    Decimal(
+                        getattr(
+                            row,
+                            "computed_new_account_balance",
+                            row.new_account_balance,
+                        )
+                    ).quantize(cent),
+                )
+                for row in data
+            ]
+
+        for name in "abc":
+            for number in range(1, 5):
+                stored = page("stored", number, name)
+                assert stored
+                assert stored == page("window", number, name)
+                assert stored == page("subquery", number, name)
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    def test_cursors(self):
+        user, _, account = create_ledger()
+        now = timezone.now()
+        rng = random.Random(3)
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    account=account,
+                    amount=Decimal(i),
+                    # coarse datetimes so that ties are broken by id
+                    datetime=now - timedelta(days=rng.randint(0, 5)),
+                )
+                for i in range(25)
+            ]
+        )
+        data = Transaction.objects.filter(account__currency__user=user)
+        expected = list(data.order_by("-datetime", "id").values_list("pk", flat=True))
+        order = [ObjectDict(value="-datetime")]
+
+        def page(**kwargs: Any):
+            paginator = PaginatorQueryInput._meta.container(dict(per_page=7, **kwargs))
+            # the paginator of the numbered pages or the cursor
+            rows, kwargs = filter_order_paginate(data, None, order, paginator)
+            (paginator,) = kwargs.values()
+            return [row.pk for row in rows], paginator
+
+        pks, paginator = page(page=1)
+        assert pks == expected[:7]
+        assert paginator.items == 25
+
+        # forward from the cursor of the first numbered page
+        with CaptureQueriesContext(connection) as context:
+            while paginator.after:
+                rows, paginator = page(after=paginator.after)
+                assert isinstance(paginator, CursorPaginatorType)
+                pks += rows
+        assert pks == expected
+        assert len(context.captured_queries) == 3
+        assert not any(
+            "COUNT(" in q["sql"] or "OFFSET" in q["sql"]
+            for q in context.captured_queries
+        )
+
+        # backward from the end
+        pks, paginator = page(before="")
+        assert pks == expected[-7:]
+        while paginator.before:
+            rows, paginator = page(before=paginator.before)
+            pks = rows + pks
+        assert pks == expected
+
+        with pytest.raises(ValueError):
+            page(after="invalid")
+
+
+@pytest.mark.django_db
+class TestTransactionFilter:
+    def test_rewrites(self):
+        user, _, account = create_ledger()
+        now = timezone.now()
+        for amount, days in (("12", 1), ("12.5", 2), ("-12.75", 3), ("112", -1)):
+            Transaction(
+                account=account,
+                amount=Decimal(amount),
+                datetime=now - timedelta(days=days),
+            ).save()
+        data = Transaction.objects.filter(account__currency__user=user)
+
+        def names(**filters: Any):
+            rows = TransactionFilterQueryInput.filter(data, **filters)
+            sql = str(rows.query)
+            # neither casts of the numbers to text nor the operation case
+            assert "LIKE" not in sql and "CASE" not in sql
+            return sorted(str(row.amount) for row in rows)
+
+        assert names(amount__icontains="12") == ["-12.75", "12.00", "12.50"]
+        assert names(amount__icontains="12.5") == ["12.50"]
+        assert names(amount__icontains="-12.7") == ["-12.75"]
+        assert names(operation="DEBIT") == ["-12.75"]
+        assert names(operation="CREDIT") == ["112.00", "12.00", "12.50"]
+        assert names(scheduled=True) == ["112.00"]
+        assert names(scheduled=False) == ["-12.75", "12.00", "12.50"]
+        first = data.order_by("pk").first()
+        assert names(id__icontains=str(first.pk)) == [str(first.amount)]  # type: ignore
+        assert len(names(account__id__icontains=str(account.pk))) == 4
+        # non numeric input keeps the text lookup
+        rows = TransactionFilterQueryInput.filter(data, amount__icontains="x")
+        assert "LIKE" in str(rows.query) and not rows.exists()
+
+        # the negative input matches the mirrored range, its bound included
+        for amount in ("-1.5", "-1.6", "-1.59"):
+            Transaction(
+                account=account, amount=Decimal(amount), datetime=now - timedelta(4)
+            ).save()
+        assert names(amount__icontains="-1.5") == ["-1.50", "-1.59"]
+        assert names(amount__icontains="-1.6") == ["-1.60"]
+        assert names(amount__icontains="1.5") == ["-1.50", "-1.59"]
+
+        # the time-dependent filters keep the key of their cached count
+        cache.clear()
+        rows = TransactionFilterQueryInput.filter(data, scheduled=True)
+        assert cached_count(rows, user) == 1
+        with CaptureQueriesContext(connection) as context:
+            rows = TransactionFilterQueryInput.filter(data, scheduled=True)
+            assert cached_count(rows, user) == 1
+        assert not context.captured_queries
+
+    def test_calendar(self):
+        user, _, account = create_ledger()
+        # around the local midnights and month ends, UTC is 8 hours behind
+        start = datetime(2024, 1, 31, 22, tzinfo=UTC)
+        for hours in range(0, 24 * 40, 5):
+            Transaction(
+                account=account,
+                amount=Decimal(1),
+                datetime=start + timedelta(hours=hours),
+            ).save()
+        data = Transaction.objects.filter(account__currency__user=user)
+
+        for lookup, value in (
+            ("datetime__month", 2),
+            ("datetime__day", 1),
+            ("datetime__hour", 6),
+        ):
+            rows = TransactionFilterQueryInput.filter(data, **{lookup: value})
+            # compared with the stored parts, not converted row by row
+            assert "django_datetime_extract" not in str(rows.query)
+            expected = data.filter(**{lookup: value})
+            assert "django_datetime_extract" in str(expected.query)
+            assert set(rows) == set(expected) and rows.exists()
+
+
+@pytest.mark.django_db
+class TestBalanceCheckpoint:
+    def test_get_balance(self):
+        _, _, account = create_ledger()
+        now = timezone.now()
+        rng = random.Random(1)
+
+        rows = []
+        for _ in range(60):
+            row = Transaction(
+                account=account,
+                amount=Decimal(rng.randint(-5000, 5000)) / 100,
+                datetime=now - timedelta(days=rng.randint(0, 240)),
+            )
+            row.save()
+            rows.append(row)
+
+        def expected(datetime):
+            return sum(
+                (r.amount for r in rows if r.pk and r.datetime <= datetime),
+                Decimal("0"),
+            )
+
+        for days in (0, 15, 45, 100, 200, 300):
+            datetime = now - timedelta(days=days)
+            assert BalanceCheckpoint.objects.get_balance(
+                account.pk, datetime
+            ) == expected(datetime)
+        assert BalanceCheckpoint.objects.filter(account=account).count() >= 7
+
+        # back-dated insert, update and delete rebuild the later checkpoints
+        row = Transaction(
+            account=account, amount=Decimal("1000"), datetime=now - timedelta(200)
+        )
+        row.save()
+        rows.append(row)
+        rows[0].datetime = now - timedelta(days=230)
+        rows[0].save()
+        rows[1].delete()
+        rows[1].pk = None
+        for days in (0, 100, 199, 201, 229, 231):
+            datetime = now - timedelta(days=days)
+            assert BalanceCheckpoint.objects.get_balance(
+                account.pk, datetime
+            ) == expected(datetime)
+
+    def test_inactive_account(self):
+        _, _, account = create_ledger()
+        now = timezone.now()
+        Transaction(
+            account=account, amount=Decimal("10"), datetime=now - timedelta(days=100)
+        ).save()
+        assert BalanceCheckpoint.objects.get_balance(account.pk, now) == 10
+
+        # the months without rows are not rebuilt on every lookup
+        with CaptureQueriesContext(connection) as context:
+            assert BalanceCheckpoint.objects.get_balance(account.pk, now) == 10
+        assert len(context.captured_queries) == 3
+
+        # a concurrent rebuild that wrote the same checkpoints first
+        with mock.patch.object(QuerySet, "delete"):
+            BalanceCheckpoint.objects.rebuild(account.pk)
+        assert BalanceCheckpoint.objects.get_balance(account.pk, now) == 10
+
+
+class TestTransactionMutation(TestGraphQL, TransactionSchema):
+    def test_balances(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+
+        ids = []
+        for days, amount in ((2, "100.00"), (0, "-25.50"), (1, "10.00")):
+            response = gql(
+                self.mutation(
+                    self.createTransaction(
+                        account=account.pk,
+                        amount=amount,
+                        datetime=(now - timedelta(days=days)).isoformat(),
+                    )
+                ).render(),
+                headers=headers,
+            )
+            content = json.loads(response.content)
+            ids.append(content["data"]["createTransaction"]["data"]["id"])
+        data = content["data"]["createTransaction"]["data"]
+        assert Decimal(data["oldAccountBalance"]) == Decimal("100.00")
+        assert Decimal(data["newAccountBalance"]) == Decimal("110.00")
+
+        response = gql(
+            self.mutation(
+                self.updateTransaction(
+                    id=ids[0], datetime=(now - timedelta(hours=1)).isoformat()
+                )
+            ).render(),
+            headers=headers,
+        )
+        content = json.loads(response.content)
+        data = content["data"]["updateTransaction"]["data"]
+        assert Decimal(data["oldAccountBalance"]) == Decimal("10.00")
+        assert_balances(account)
+
+        gql(self.mutation(self.deleteTransaction(ids[2])).render(), headers=headers)
+        assert_balances(account)
+
+    def test_cursor_pagination(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days in range(5):
+            Transaction(
+                account=account, amount=Decimal(days), datetime=now - timedelta(days)
+            ).save()
+
+        ids: list[str] = []
+        paginator = dict(per_page=2, after="")
+        while paginator["after"] is not None:
+            action = self.listTransactions(paginator=paginator)
+            response = gql(self.query(action).render(), headers=headers)
+            content = json.loads(response.content)["data"]["listTransactions"]
+            assert content["paginator"] is None
+            ids += [row["id"] for row in content["data"]]
+            paginator = dict(per_page=2, after=content["cursor"]["after"])
+        assert ids == [
+            str(pk)
+            for pk in Transaction.objects.order_by("id").values_list("pk", flat=True)
+        ]
+
+    def test_limits(self, gql: Any, settings: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        Transaction(account=account, amount=Decimal(1), datetime=timezone.now()).save()
+
+        settings.PAGINATOR_MAX_PER_PAGE = 5
+        action = self.listTransactions(paginator=dict(per_page=10000))
+        response = gql(self.query(action).render(), headers=headers)
+        content = json.loads(response.content)["data"]["listTransactions"]
+        assert content["paginator"]["perPage"] == 5
+
+        # the queries still running past the deadline are interrupted
+        settings.GRAPHQL_DATABASE_DEADLINE = 1e-9
+        with mock.patch("utils.cost.PROGRESS_STEPS", 1):
+            response = gql(self.query(action).render(), headers=headers)
+        assert json.loads(response.content)["errors"][0]["message"] == "interrupted"
+        settings.GRAPHQL_DATABASE_DEADLINE = 10
+        response = gql(self.query(action).render(), headers=headers)
+        assert "errors" not in json.loads(response.content)
+
+    def test_timing(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        for days in range(3):
+            Transaction(
+                account=account, amount=Decimal(days), datetime=timezone.now()
+            ).save()
+
+        observed = registry.histogram(
+            "graphql_request_seconds", SECONDS, operation="listTransactions"
+        )
+        observations = sum(observed.counts)
+        query = self.query(self.listTransactions()).render()
+        content = json.loads(gql(query, headers=headers).content)
+        assert "extensions" not in content
+
+        with CaptureQueriesContext(connection) as context:
+            response = gql(query, headers={**headers, "HTTP_X_DEBUG_TIMING": "1"})
+        timing = json.loads(response.content)["extensions"]["timing"]
+        assert timing["operation"] == "listTransactions"
+        assert timing["queries"] == len(context.captured_queries)
+        resolvers = timing["resolvers"]
+        assert resolvers["Query.listTransactions"]["calls"] == 1
+        assert resolvers["Query.listTransactions"]["queries"] >= 1
+        assert resolvers["TransactionType.amount"]["calls"] == 3
+        # the user of the token is read before the first resolver
+        assert sum(r["queries"] for r in resolvers.values()) == timing["queries"] - 1
+        assert sum(observed.counts) == observations + 2
+
+    def test_query_plan(self, gql: Any):
+        _, _, account = create_ledger()
+        _, _, other = create_ledger(name="Bank")
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for acc in (account, other):
+            for days in range(-5, 20):
+                Transaction(
+                    account=acc, amount=Decimal(days), datetime=now - timedelta(days)
+                ).save()
+
+        with CaptureQueriesContext(connection) as context:
+            gql(self.query(self.listTransactions()).render(), headers=headers)
+        assert not self.full_scans(
+            context.captured_queries,
+            "transactions_transaction",
+            "accounts_account",
+            "currencies_currency",
+        )
+
+    def import_file(self, client: Any, headers: dict[str, str], file: Any):
+        operation = self.mutation(
+            "ImportTransactions($file: Upload!)", self.importTransactions()
+        )
+        response = client.post(
+            "/graphql",
+            dict(
+                operations=json.dumps(dict(query=operation.render(), variables={})),
+                map=json.dumps({"0": ["variables.file"]}),
+                **{"0": file},
+            ),
+            **headers,
+        )
+        return json.loads(response.content)["data"]["importTransactions"]
+
+    def test_import(self, gql: Any, client: Any):
+        user, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        Transaction(account=account, amount=Decimal("5"), datetime=now).save()
+        _, _, other = create_ledger(name="Bank")
+        stranger = User(**props.copy(email="stranger@email.com"))
+        stranger.save()
+        foreign = Account(
+            currency=Currency.objects.create(user=stranger, abbreviation="usd"),
+            name="Foreign",
+        )
+        foreign.save()
+
+        lines = ["account,amount,datetime,name,tags"]
+        for days in range(10):
+            lines.append(
+                f"{account.pk},{days},{(now - timedelta(days)).isoformat()},"
+                f"row {days},food;{'rent' if days % 2 else 'food'}"
+            )
+        lines.append(f"{other.pk},100,{(now + timedelta(1)).isoformat()},later,")
+        lines.append(f"{account.pk},abc,,bad amount,")
+        lines.append(f"{foreign.pk},1,,foreign,")
+        lines.append(",1,,no account,")
+        file = SimpleUploadedFile("statement.csv", "\n".join(lines).encode())
+        assert Upload.serialize(file) == "statement.csv"
+        data = self.import_file(client, headers, file)
+        assert data["count"] == 11
+        assert [(e["row"], e["field"]) for e in data["errors"]] == [
+            (12, "amount"),
+            (13, "account"),
+            (14, "account"),
+        ]
+        assert_balances(account)
+        assert_balances(other)
+        assert_account_balances(account)
+        assert_account_balances(other)
+        assert Transaction.objects.filter(account=other, scheduled=True).count() == 1
+        assert sorted(Tag.objects.filter(user=user).values_list("name", flat=True)) == [
+            "food",
+            "rent",
+        ]
+        assert Tag.objects.get(user=user, name="rent").transaction_set.count() == 5
+
+        lines = [
+            json.dumps(dict(account=account.pk, amount="-3.50", tags=["rent"])),
+            "",
+            "not json",
+            json.dumps(dict(account=other.pk, datetime="yesterday")),
+        ]
+        file = SimpleUploadedFile("statement.ndjson", "\n".join(lines).encode())
+        data = self.import_file(client, headers, file)
+        assert data["count"] == 1
+        assert [(e["row"], e["field"]) for e in data["errors"]] == [
+            (3, "__all__"),
+            (4, "datetime"),
+        ]
+        assert Tag.objects.get(user=user, name="rent").transaction_set.count() == 6
+        assert_balances(account)
+        assert_account_balances(account)
+
+    def test_export(self, gql: Any, client: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days in range(5):
+            Transaction(
+                account=account,
+                amount=Decimal(days - 2),
+                datetime=now - timedelta(days),
+                name="rent" if days % 2 else "food",
+            ).save()
+
+        assert client.get("/export/transactions").status_code == 401
+        response = client.get(
+            "/export/transactions", dict(filter='{"name_Icontains": 1}'), **headers
+        )
+        assert response.status_code == 400
+
+        response = client.get("/export/transactions", **headers)
+        assert response["Content-Type"] == "text/csv"
+        rows = list(csv.DictReader(io.StringIO(response.getvalue().decode())))
+        assert [Decimal(r["amount"]) for r in rows] == [2, 1, 0, -1, -2]
+        assert Decimal(rows[-1]["new_account_balance"]) == 0
+
+        response = client.get(
+            "/export/transactions",
+            dict(format="ndjson", filter=json.dumps(dict(name_Icontains="rent"))),
+            **headers,
+        )
+        rows = [json.loads(line) for line in response.getvalue().decode().splitlines()]
+        assert [(r["name"], r["operation"]) for r in rows] == [
+            ("rent", "CREDIT"),
+            ("rent", "DEBIT"),
+        ]
+
+        # due but not matured yet, exported like the api reports it
+        row = Transaction(
+            account=account, amount=Decimal("1"), datetime=now + timedelta(1)
+        )
+        row.save()
+        Transaction.objects.filter(pk=row.pk).update(datetime=now)
+        response = client.get(
+            "/export/transactions",
+            dict(format="ndjson", filter=json.dumps(dict(scheduled=False))),
+            **headers,
+        )
+        rows = [json.loads(line) for line in response.getvalue().decode().splitlines()]
+        assert len(rows) == 6
+        assert not any(r["scheduled"] for r in rows)
+
+    def test_batch(self, gql: Any):
+        _, _, account = create_ledger()
+        _, _, other = create_ledger(name="Bank")
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+
+        def execute(action):
+            response = gql(self.mutation(action).render(), headers=headers)
+            return json.loads(response.content)["data"][action.name]
+
+        data = execute(
+            self.createTransactions(
+                *(
+                    dict(
+                        account=account.pk if days % 2 else other.pk,
+                        amount=str(days * 10),
+                        datetime=(now - timedelta(days)).isoformat(),
+                        tags=["batch"],
+                    )
+                    for days in range(-2, 8)
+                )
+            )
+        )
+        assert not data["errors"]
+        ids = [row["id"] for row in data["data"]]
+        assert len(ids) == 10
+        assert Tag.objects.get(name="batch").transaction_set.count() == 10
+        for acc in (account, other):
+            assert_balances(acc)
+            assert_account_balances(acc)
+
+        # nothing is written when any of the rows is invalid
+        data = execute(
+            self.createTransactions(
+                dict(account=account.pk, amount="1"),
+                dict(account=account.pk, name="x" * 60),
+                dict(account=0, amount="1"),
+            )
+        )
+        assert not data["data"]
+        assert [(e["row"], e["field"]) for e in data["errors"]] == [
+            (1, "name"),
+            (2, "account"),
+        ]
+        assert Transaction.objects.count() == 10
+
+        data = execute(
+            self.updateTransactions(
+                dict(id=ids[0], account=account.pk, remove_tags=["batch"]),
+                dict(
+                    id=ids[1], amount="-5", datetime=(now - timedelta(30)).isoformat()
+                ),
+                dict(id=ids[2], add_tags=["moved"]),
+            )
+        )
+        assert not data["errors"]
+        assert Decimal(data["data"][1]["oldAccountBalance"]) == 0
+        assert Tag.objects.get(name="batch").transaction_set.count() == 9
+        assert Tag.objects.get(name="moved").transaction_set.count() == 1
+        for acc in (account, other):
+            assert_balances(acc)
+            assert_account_balances(acc)
+
+        data = execute(self.deleteTransactions(ids[3], 0))
+        assert [(e["row"], e["field"]) for e in data["errors"]] == [(1, "id")]
+        data = execute(self.deleteTransactions(*ids[3:6]))
+        assert not data["errors"]
+        assert Transaction.objects.count() == 7
+        for acc in (account, other):
+            assert_balances(acc)
+            assert_account_balances(acc)
+
+    def test_tag_queries(self, gql: Any, django_assert_num_queries: Any):
+        user, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        Tag.objects.bulk_create([Tag(user=user, name=f"old {i}") for i in range(5)])
+        ids = list(Tag.objects.values_list("pk", flat=True))
+
+        def create(*tags: str, tag_ids: Any = ()):
+            action = self.createTransaction(
+                account=account.pk,
+                amount="1",
+                datetime=timezone.now().isoformat(),
+                tags=list(tags),
+                tag_ids=list(tag_ids),
+            )
+            response = gql(self.mutation(action).render(), headers=headers)
+            return json.loads(response.content)["data"]["createTransaction"]["data"]
+
+        # the number of queries does not depend on the number of tags
+        with django_assert_num_queries(QUERIES["createTransaction"]):
+            create("new")
+        with django_assert_num_queries(QUERIES["createTransaction"]):
+            data = create(
+                *(f"new {i}" for i in range(10)),
+                "old 0",
+                "old 1",
+                "old 1",
+                tag_ids=ids[2:],
+            )
+        assert Tag.objects.get(pk=ids[1]).transaction_set.get().pk == int(data["id"])
+        assert Transaction.objects.get(pk=data["id"]).tag_set.count() == 15
+
+        action = self.updateTransaction(
+            id=data["id"],
+            add_tags=[f"other {i}" for i in range(5)],
+            remove_tags=[f"new {i}" for i in range(10)],
+            remove_tag_ids=ids[:2],
+        )
+        with django_assert_num_queries(QUERIES["updateTransaction"]):
+            gql(self.mutation(action).render(), headers=headers)
+        assert Transaction.objects.get(pk=data["id"]).tag_set.count() == 8
+
+    def test_counts(self, gql: Any, settings: Any):
+        settings.TRANSACTION_BALANCE_MODE = "subquery"
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days in range(5):
+            Transaction(
+                account=account, amount=Decimal(days), datetime=now - timedelta(days)
+            ).save()
+
+        def counts(paginator: GqlType):
+            action = GqlAction(
+                "listTransactions",
+                GqlArgument(paginator=dict(per_page=2)),
+                GqlType(data=GqlType("id"), paginator=paginator),
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = gql(self.query(action).render(), headers=headers)
+            content = json.loads(response.content)["data"]["listTransactions"]
+            queries = [
+                q["sql"] for q in context.captured_queries if "COUNT(" in q["sql"]
+            ]
+            return content["paginator"], queries
+
+        # not counted unless the items or pages are queried
+        paginator, queries = counts(GqlType("per_page", page=self.PageType))
+        assert paginator["page"]["next"] == 2
+        assert not queries
+
+        paginator, queries = counts(self.PaginatorType)
+        assert (paginator["items"], paginator["pages"]) == (5, 3)
+        assert len(queries) == 1
+        assert "account_balance" not in queries[0]
+        paginator, queries = counts(GqlType("items"))
+        assert paginator["items"] == 5
+        assert not queries
+
+        # invalidated by the transaction mutations
+        gql(
+            self.mutation(
+                self.createTransaction(
+                    account=account.pk, amount="1", datetime=now.isoformat()
+                )
+            ).render(),
+            headers=headers,
+        )
+        paginator, queries = counts(GqlType("items"))
+        assert paginator["items"] == 6
+        assert len(queries) == 1
+
+    def test_stale_counts(self, gql: Any):
+        self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        tag = Tag.objects.get(name="tag 0")
+
+        def listed(name: str):
+            action = GqlAction(
+                "listTransactions",
+                GqlArgument(filter=dict(tag__name__icontains=name)),
+                GqlType(data=GqlType("id"), paginator=GqlType("items")),
+            )
+            response = gql(self.query(action).render(), headers=headers)
+            return json.loads(response.content)["data"]["listTransactions"]
+
+        assert listed("renamed") == dict(data=[], paginator=dict(items=0))
+        # the transaction lists depend on the tags through the many to many
+        action = GqlAction(
+            "updateTag",
+            GqlArgument(input=dict(id=tag.pk, name="renamed")),
+            GqlType(data=GqlType("name")),
+        )
+        gql(self.mutation(action).render(), headers=headers)
+        content = listed("renamed")
+        assert content["paginator"]["items"] == 7
+        assert len(content["data"]) == 7
+
+        # the rows are sliced live even when the cached count is stale, e.g.
+        # after writes that do not go through the api
+        assert listed("fresh")["paginator"]["items"] == 0
+        Tag.objects.filter(pk=tag.pk).update(name="fresh")
+        content = listed("fresh")
+        assert content["paginator"]["items"] == 0
+        assert len(content["data"]) == 7
+
+    def test_scheduled(self, gql: Any):
+        _, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        rows = []
+        for hours in range(1, 6):
+            row = Transaction(
+                account=account,
+                amount=Decimal("5"),
+                datetime=now + timedelta(hours=hours),
+            )
+            row.save()
+            rows.append(row)
+
+        def listed(scheduled: bool, *fields: str):
+            action = GqlAction(
+                "listTransactions",
+                GqlArgument(filter=dict(scheduled=scheduled)),
+                GqlType(data=GqlType("id", *fields)),
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = gql(self.query(action).render(), headers=headers)
+            content = json.loads(response.content)["data"]["listTransactions"]
+            return content["data"], len(context.captured_queries)
+
+        # the datetime it is resolved from is loaded with the rows
+        data, queries = listed(True, "scheduled")
+        assert data == [dict(id=str(row.pk), scheduled=True) for row in rows]
+        assert queries == listed(True)[1]
+        # due but not matured yet, the field agrees with the filter
+        Transaction.objects.filter(pk=rows[0].pk).update(
+            datetime=now - timedelta(hours=1)
+        )
+        assert len(listed(True, "scheduled")[0]) == 4
+        data, _ = listed(False, "scheduled")
+        assert data == [dict(id=str(rows[0].pk), scheduled=False)]
+
+    def test_last_page(self, gql: Any):
+        self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+
+        # a page past the last one is the last one, counted or not
+        def page(paginator: GqlType):
+            action = GqlAction(
+                "listTransactions",
+                GqlArgument(paginator=dict(per_page=3, page=50)),
+                GqlType(data=GqlType("id"), paginator=paginator),
+            )
+            response = gql(self.query(action).render(), headers=headers)
+            return json.loads(response.content)["data"]["listTransactions"]
+
+        uncounted = page(GqlType(page=self.PageType))
+        counted = page(GqlType("items", page=self.PageType))
+        assert counted["paginator"]["items"] == 20
+        assert uncounted["data"] == counted["data"]
+        assert len(counted["data"]) == 2
+        assert uncounted["paginator"]["page"] == counted["paginator"]["page"]
+        assert counted["paginator"]["page"] == dict(previous=6, current=7, next=None)
+
+    def create_tagged_rows(self):
+        user, _, account = create_ledger()
+        _, _, other = create_ledger(name="Bank")
+        now = timezone.now()
+        rows = []
+        for days in range(20):
+            row = Transaction(
+                account=account if days % 2 else other,
+                amount=Decimal(days),
+                datetime=now - timedelta(days),
+            )
+            row.save()
+            Tag.objects.link(user, [(row, [f"tag {days % 3}", "all"], ())])
+            rows.append(row)
+        return rows
+
+    RelationsType = GqlType(
+        "id",
+        account=GqlType("name", currency=GqlType("name")),
+        tag_set=GqlType("name", user=GqlType("email")),
+    )
+
+    def test_loaders(self, gql: Any):
+        rows = self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+
+        # the batch payloads are not planned, their relations are loaded for
+        # the whole list at once instead of row by row
+        action = GqlAction(
+            "updateTransactions",
+            GqlArgument(input=[dict(id=row.pk) for row in rows]),
+            GqlType(data=self.RelationsType),
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = gql(self.mutation(action).render(), headers=headers)
+        data = json.loads(response.content)["data"]["updateTransactions"]["data"]
+        assert len(data) == 20
+        assert all(len(row["tagSet"]) == 2 for row in data)
+        assert {row["account"]["currency"]["name"] for row in data} == {"Peso"}
+        tables = [
+            re.search(r'FROM "(\w+)"', q["sql"])[1]  # type: ignore
+            for q in context.captured_queries
+            if q["sql"].startswith("SELECT")
+        ]
+        assert tables[-5:] == [
+            "transactions_transaction",
+            "accounts_account",
+            "currencies_currency",
+            "tags_tag",
+            "users_user",
+        ]
+
+    def test_planner(self, gql: Any, settings: Any):
+        settings.TRANSACTION_BALANCE_MODE = "subquery"
+        self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+
+        action = GqlAction(
+            "listTransactions",
+            GqlArgument(paginator=dict(per_page=20)),
+            GqlType(data=self.RelationsType),
+        )
+        # the accounts and currencies are joined and the tags prefetched
+        with CaptureQueriesContext(connection) as context:
+            response = gql(self.query(action).render(), headers=headers)
+        data = json.loads(response.content)["data"]["listTransactions"]["data"]
+        assert len(data) == 20
+        assert all(len(row["tagSet"]) == 2 for row in data)
+        assert {row["account"]["currency"]["name"] for row in data} == {"Peso"}
+        queries = [q["sql"] for q in context.captured_queries]
+        assert len(queries) == 3
+        assert 'INNER JOIN "currencies_currency"' in queries[1]
+        # neither unselected columns nor the running balance subqueries
+        assert '"description"' not in queries[1]
+        assert "SUM(" not in queries[1]
+
+        action = self.getTransaction(data[0]["id"])
+        response = gql(self.query(action).render(), headers=headers)
+        content = json.loads(response.content)["data"]["getTransaction"]["data"]
+        transaction = Transaction.objects.get(pk=data[0]["id"])
+        assert Decimal(content["newAccountBalance"]) == transaction.new_account_balance
+        assert content["operation"] == transaction.operation
+
+    def test_lazy_balances(self, gql: Any, settings: Any):
+        settings.TRANSACTION_BALANCE_MODE = "window"
+        self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+
+        # the window scan only runs when the balances are selected
+        for fields, expected in (
+            (("id", "operation"), 2),
+            (("id", "operation", "newAccountBalance"), 3),
+        ):
+            action = GqlAction(
+                "listTransactions",
+                GqlArgument(paginator=dict(per_page=20)),
+                GqlType(data=GqlType(*fields)),
+            )
+            with CaptureQueriesContext(connection) as context:
+                response = gql(self.query(action).render(), headers=headers)
+            data = json.loads(response.content)["data"]["listTransactions"]["data"]
+            assert len(data) == 20
+            queries = [q["sql"] for q in context.captured_queries]
+            # the user of the token, the page and then the window scan
+            assert len(queries) == expected
+            assert '"operation"' not in queries[1]
+            assert '"description"' not in queries[1]
+        rows = Transaction.objects.in_bulk([row["id"] for row in data])
+        for row in data:
+            transaction = rows[int(row["id"])]
+            assert row["operation"] == transaction.operation
+            assert Decimal(row["newAccountBalance"]) == transaction.new_account_balance
+
+    def test_relation_filters(self, gql: Any):
+        user, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        rows = []
+        for days in range(10):
+            row = Transaction(
+                account=account, amount=Decimal(days), datetime=now - timedelta(days)
+            )
+            row.save()
+            rows.append(row)
+        # every row matches through many of its tags
+        Tag.objects.link(
+            user, [(row, [f"tag {i}" for i in range(25)], ()) for row in rows]
+        )
+
+        action = GqlAction(
+            "listTransactions",
+            GqlArgument(
+                filter=dict(tag__name__icontains="tag", name__icontains="none"),
+                paginator=dict(per_page=20),
+            ),
+            GqlType(data=GqlType("id"), paginator=GqlType("items")),
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = gql(self.query(action).render(), headers=headers)
+        content = json.loads(response.content)["data"]["listTransactions"]
+        assert sorted(int(row["id"]) for row in content["data"]) == sorted(
+            row.pk for row in rows
+        )
+        assert content["paginator"]["items"] == 10
+        # one row per transaction, without joining the tags or a DISTINCT
+        page = next(
+            q["sql"]
+            for q in context.captured_queries
+            if q["sql"].startswith('SELECT "transactions_transaction"."id"')
+        )
+        assert "EXISTS(" in page
+        assert "DISTINCT" not in page
+        assert 'JOIN "tags_tag"' not in page.split("EXISTS(")[0]
+
+    def test_nested_filters(self, gql: Any):
+        rows = self.create_tagged_rows()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        account = rows[1].account
+        since = timezone.now() - timedelta(days=10, hours=12)
+
+        # this account and (tag 0 or tag 1) and not older than ten days
+        filter = {
+            "and": [
+                dict(account__id__icontains=account.pk),
+                {
+                    "or": [
+                        dict(tag__name__icontains="tag 0"),
+                        dict(tag__name__icontains="tag 1"),
+                    ]
+                },
+                {"not": dict(datetime__lt=since.isoformat())},
+            ]
+        }
+        action = GqlAction(
+            "listTransactions",
+            GqlArgument(filter=filter, paginator=dict(per_page=20)),
+            GqlType(data=GqlType("id"), paginator=GqlType("items")),
+        )
+        response = gql(self.query(action).render(), headers=headers)
+        content = json.loads(response.content)["data"]["listTransactions"]
+        expected = [
+            row.pk
+            for days, row in enumerate(rows)
+            if row.account == account and days % 3 in (0, 1) and days <= 10
+        ]
+        assert sorted(int(row["id"]) for row in content["data"]) == expected
+        assert content["paginator"]["items"] == len(expected)
+
+    def test_search(self, gql: Any):
+        user, _, account = create_ledger()
+        headers = TestAuth.sign_in(gql, props.email, props.password)
+        now = timezone.now()
+        for days, (name, description) in enumerate(
+            (
+                ("Groceries", "groceries of the week"),
+                ("Rent", "apartment"),
+                ("Grocery delivery", "market"),
+                ("Salary", "october"),
+            )
+        ):
+            action = self.createTransaction(
+                account=account.pk,
+                amount="-10",
+                datetime=(now - timedelta(days)).isoformat(),
+                name=name,
+                description=description,
+            )
+            gql(self.mutation(action).render(), headers=headers)
+        rows = {row.name: row for row in Transaction.objects.all()}
+
+        def search(query: str, **kwargs: Any):
+            action = self.searchTransactions(query, **kwargs)
+            response = gql(self.query(action).render(), headers=headers)
+            content = json.loads(response.content)["data"]["searchTransactions"]
+            return [row["name"] for row in content["data"]], content["paginator"]
+
+        # prefix matches, the row matching twice ranks first
+        names, paginator = search("groc")
+        assert names == ["Groceries", "Grocery delivery"]
+        assert paginator["items"] == 2
+        assert search("market groc")[0] == ["Grocery delivery"]
+        assert search("nothing")[0] == []
+        assert search("*(-)")[0] == []
+
+        # kept in sync with the tags, the renamed accounts and deleted rows
+        Tag.objects.link(user, [(rows["Rent"], ["housing"], ())])
+        assert search("housing")[0] == ["Rent"]
+        account.name = "Savings"
+        account.save()
+        assert len(search("savings")[0]) == 4
+        rows["Rent"].delete()
+        assert search("housing")[0] == []
+        names, paginator = search("savings", paginator=dict(per_page=2, page=2))
+        assert len(names) == 1 and paginator["page"]["previous"] == 1
+
+        # only the rows of the user
+        other = User.objects.create_user("other@email.com", "Other", "User", "pw")
+        currency = Currency.objects.create(
+            user=other, abbreviation="php", symbol="P", name="Peso"
+        )
+        Transaction(
+            account=Account.objects.create(currency=currency, name="Savings"),
+            amount=Decimal("1"),
+            datetime=now,
+            name="Groceries",
+        ).save()
+        assert len(search("groc")[0]) == 2
+
+    def test_search_deletions(self):
+        user, _, account = create_ledger()
+        now = timezone.now()
+        rows = []
+        for days in range(6):
+            row = Transaction(
+                account=account, amount=Decimal("1"), datetime=now - timedelta(days)
+            )
+            row.save()
+            rows.append(row)
+        indexed = TransactionSearch.objects.filter(transaction__account=account)
+        assert indexed.count() == 6
+
+        def deletes(func: Any):
+            # the statements removing index rows
+            table = TransactionSearch._meta.db_table
+            with CaptureQueriesContext(connection) as context:
+                func()
+            return [
+                q
+                for q in context.captured_queries
+                if f'DELETE FROM "{table}"' in q["sql"]
+            ]
+
+        batch = TransactionBatch(user)
+        assert len(deletes(lambda: batch.delete([row.pk for row in rows[:3]]))) == 1
+        assert indexed.count() == 3
+        rows[3].delete()
+        assert indexed.count() == 2
+        # the cascade of the account removes them at once
+        assert len(deletes(account.delete)) == 1
+        assert not TransactionSearch.objects.exists()
@@ -1,3 +1,110 @@
-from django.shortcuts import render
+import csv
+import json
+from collections.abc import Iterator
 
-# Create your views here.
+from django.contrib.auth import authenticate
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+from graphql import GraphQLError
+from graphql.utilities import coerce_input_value
+
+from thriftease_api.schemas import schema
+from transactions.imports import ImportFormat
+from transactions.models import Transaction
+from transactions.schemas import TransactionFilterQueryInput
+
+# same columns the import reads, tags are joined with semicolons
+EXPORT_FIELDS = (
+    "id",
+    "account",
+    "amount",
+    "datetime",
+    "name",
+    "description",
+    "old_account_balance",
+    "new_account_balance",
+    "scheduled",
+    "operation",
+    "tags",
+)
+EXPORT_CHUNK_SIZE = 500
+
+
+class Echo:
+    # file-like object handing every csv line back to the generator
+    def write(self, value: str):
+        return value
+
+
+def export_rows(queryset) -> Iterator[dict]:
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield dict(
+            id=row.pk,
+            account=row.account_id,
+            amount=str(row.amount),
+            datetime=row.datetime.isoformat(),
+            name=row.name,
+            description=row.description,
+            old_account_balance=str(row.old_account_balance),
+            new_account_balance=str(row.new_account_balance),
+            # like the api, by the datetime rather than the maturation flag
+            scheduled=row.is_scheduled,
+            operation=str(row.operation),
+            tags=[t.name for t in row.tag_set.all()],
+        )
+
+
+def export_csv(rows: Iterator[dict]):
+    writer = csv.DictWriter(Echo(), EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(dict(row, tags=";".join(row["tags"])))
+
+
+def export_ndjson(rows: Iterator[dict]):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def parse_filter(value: str):
+    # coerced through the graphql input type so that the filter takes the
+    # same keys and values as the listTransactions filter argument
+    type_ = schema.graphql_schema.get_type(TransactionFilterQueryInput._meta.name)
+    return coerce_input_value(json.loads(value), type_)  # type: ignore
+
+
+@require_GET
+def export_transactions(request: HttpRequest):
+    user = authenticate(request=request)
+    if user is None:
+        return HttpResponse(status=401)
+
+    try:
+        format = ImportFormat(request.GET.get("format", ImportFormat.CSV))
+        filter = parse_filter(request.GET.get("filter", "{}"))
+    except (GraphQLError, ValueError) as e:
+        return HttpResponseBadRequest(str(e))
+
+    data = (
+        Transaction.objects.filter(account__currency__user=user)
+        .order_by("datetime", "id")
+        .prefetch_related("tag_set")
+    )
+    if filter:
+        data = filter.filter(data, **filter.__dict__)
+
+    rows = export_rows(data)
+    if format == ImportFormat.NDJSON:
+        response = StreamingHttpResponse(
+            export_ndjson(rows), content_type="application/x-ndjson"
+        )
+    else:
+        response = StreamingHttpResponse(export_csv(rows), content_type="text/csv")
+    disposition = f'attachment; filename="transactions.{format.value}"'
+    response["Content-Disposition"] = disposition
+    return response
@@ -1,13 +1,17 @@
 import re
 from collections.abc import Mapping
+from functools import partial
 from typing import Any
 
 from django.db import models
 from django.forms import ValidationError
 from django.utils.translation import gettext as _
 
+from utils.counts import cached_count, count
 from utils.filter import FilterQueryInput
-from utils.paginator import PaginatorQueryInput
+from utils.paginator import CursorPaginatorType, PaginatorQueryInput
+from utils.planner import plan
+from utils.selection import selects
 
 
 def formfield_extra_kwargs(**kwargs: dict[str, Any]):
@@ -101,12 +105,26 @@ def filter_order_paginate(
     filter: FilterQueryInput | None = None,
     order: list[Any] | None = None,
     paginator: PaginatorQueryInput | None = None,
+    info: Any = None,
 ):
-    data = queryset.order_by("id")
+    # an explicitly ordered queryset (e.g. the ranked search results) keeps
+    # its ordering unless the client orders it
+    data = queryset if queryset.query.order_by else queryset.order_by("id")
     if filter:
         data = filter.filter(data, **filter.__dict__)
     if order:
         data = data.order_by(*(e.value for e in order))
+    # joins, prefetches and columns of the rows the client selected
+    data = plan(data, info)
     paginator = paginator or PaginatorQueryInput()
-    data, dpaginator = paginator.paginate(data)
+    # resolvers pass their info so that the count only runs, cached, when the
+    # items or pages are actually queried
+    counter = count
+    if info is not None:
+        counter = None
+        if selects(info, "paginator", "items") or selects(info, "paginator", "pages"):
+            counter = partial(cached_count, user=info.context.user)
+    data, dpaginator = paginator.paginate(data, counter)
+    if isinstance(dpaginator, CursorPaginatorType):
+        return data, dict(cursor=dpaginator)
     return data, dict(paginator=dpaginator)
@@ -0,0 +1,164 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from django.conf import settings
+from django.db import connection
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    IntValueNode,
+    ObjectValueNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    get_named_type,
+    is_composite_type,
+)
+from graphql.validation import ValidationRule
+
+# sqlite virtual machine instructions between two checks of the deadline
+PROGRESS_STEPS = 10_000
+
+
+def is_list(type_: Any):
+    if isinstance(type_, GraphQLNonNull):
+        type_ = type_.of_type
+    return isinstance(type_, GraphQLList)
+
+
+def page_size(node: FieldNode):
+    # the perPage of the paginator argument, capped like the paginator caps
+    # it, or the cap itself when it is given by a variable
+    limit = settings.PAGINATOR_MAX_PER_PAGE
+    for argument in node.arguments:
+        if argument.name.value != "paginator":
+            continue
+        if not isinstance(argument.value, ObjectValueNode):
+            return limit
+        for field in argument.value.fields:
+            if field.name.value == "perPage":
+                if isinstance(field.value, IntValueNode):
+                    return min(max(int(field.value.value), 1), limit)
+                return limit
+        break
+    return None
+
+
+class CostRule(ValidationRule):
+    # rejects the operations nested deeper than GRAPHQL_MAX_DEPTH or costing
+    # more than GRAPHQL_MAX_COST, a field costs its weight (1 for the objects
+    # and 0 for the scalars unless GRAPHQL_COST_WEIGHTS says otherwise) plus
+    # the cost of its selections, once per row: perPage rows for the data of
+    # the paginated payloads and GRAPHQL_COST_LIST_SIZE rows for other lists
+    def enter_operation_definition(self, node: OperationDefinitionNode, *args: Any):
+        root = self.context.schema.get_root_type(node.operation)
+        if root is None:
+            return
+        cost, depth = self.selection_cost(root, node.selection_set, None, set())
+        max_depth = settings.GRAPHQL_MAX_DEPTH
+        if depth > max_depth:
+            self.report_error(
+                GraphQLError(
+                    f"The operation is nested {depth} levels deep,"
+                    f" more than the limit of {max_depth}.",
+                    node,
+                )
+            )
+        max_cost = settings.GRAPHQL_MAX_COST
+        if cost > max_cost:
+            self.report_error(
+                GraphQLError(
+                    f"The operation costs {cost}, more than the limit of {max_cost}.",
+                    node,
+                )
+            )
+
+    def selection_cost(
+        self,
+        parent: GraphQLObjectType,
+        selection_set: SelectionSetNode | None,
+        page: int | None,
+        spreads: set[str],
+    ) -> tuple[int, int]:
+        cost = depth = 0
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self.field_cost(
+                    parent, selection, page, spreads
+                )
+            elif isinstance(selection, InlineFragmentNode):
+                type_ = parent
+                if selection.type_condition:
+                    type_ = self.context.schema.get_type(
+                        selection.type_condition.name.value
+                    )
+                field_cost, field_depth = self.selection_cost(
+                    type_, selection.selection_set, page, spreads
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                # the cycles are reported by NoFragmentCyclesRule
+                if fragment is None or name in spreads:
+                    continue
+                type_ = self.context.schema.get_type(fragment.type_condition.name.value)
+                field_cost, field_depth = self.selection_cost(
+                    type_, fragment.selection_set, page, spreads | {name}
+                )
+            cost += field_cost
+            depth = max(depth, field_depth)
+        return cost, depth
+
+    def field_cost(
+        self,
+        parent: Any,
+        node: FieldNode,
+        page: int | None,
+        spreads: set[str],
+    ) -> tuple[int, int]:
+        name = node.name.value
+        # the introspection of the schema is not counted
+        if name.startswith("__") or not isinstance(parent, GraphQLObjectType):
+            return 0, 0
+        field = parent.fields.get(name)
+        if field is None:
+            return 0, 0
+        type_ = get_named_type(field.type)
+        weight = settings.GRAPHQL_COST_WEIGHTS.get(
+            f"{parent.name}.{name}", int(is_composite_type(type_))
+        )
+        if not is_composite_type(type_):
+            return weight, 1
+        rows = 1
+        if is_list(field.type):
+            rows = page if page is not None else settings.GRAPHQL_COST_LIST_SIZE
+        cost, depth = self.selection_cost(
+            type_,  # type: ignore[arg-type]
+            node.selection_set,
+            page_size(node),
+            spreads,
+        )
+        return rows * (weight + cost), depth + 1
+
+
+@contextmanager
+def database_deadline(seconds: float | None) -> Iterator[None]:
+    # interrupts the sqlite statements still running once the request took
+    # the given seconds, the interrupted queries raise OperationalError
+    if not seconds or connection.vendor != "sqlite":
+        yield
+        return
+    connection.ensure_connection()
+    raw = connection.connection
+    deadline = time.monotonic() + seconds
+    raw.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+    try:
+        yield
+    finally:
+        raw.set_progress_handler(None, 0)
@@ -0,0 +1,108 @@
+import hashlib
+from functools import lru_cache
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import models
+from graphql import OperationType, get_named_type
+
+
+def count(queryset: models.QuerySet[Any]):
+    # counts the bare rows, the annotations and ordering of the listed
+    # queryset (e.g. the running balances) are left out of the query
+    return queryset.order_by().values("pk").count()
+
+
+def generation_key(model: type[models.Model], user: Any):
+    return f"counts:{model._meta.label_lower}:{user.pk}"
+
+
+def cached_count(queryset: models.QuerySet[Any], user: Any):
+    # cached per user and filtered query, every mutation of the model by the
+    # user moves to a new generation which orphans the older counts
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        # e.g. .none() or an empty __in, there is nothing to count
+        return 0
+    generation = cache.get_or_set(generation_key(queryset.model, user), 0, None)
+    digest = hashlib.sha1(sql.encode()).hexdigest()
+    key = f"{generation_key(queryset.model, user)}:{generation}:{digest}"
+    value = cache.get(key)
+    if value is None:
+        value = count(queryset)
+        cache.set(key, value, settings.LIST_COUNT_CACHE_TIMEOUT)
+    return value
+
+
+@lru_cache(maxsize=None)
+def dependents(model: type[models.Model]) -> frozenset[type[models.Model]]:
+    # the model and the ones related to it, directly or through others, by
+    # foreign keys and many to many relations (their through models being
+    # hidden relations): their filtered lists, e.g. the transactions by tag
+    # name, change with its rows. The users are left out, the counts are per
+    # user anyway.
+    seen: set[type[models.Model]] = set()
+    pending = [model]
+    while pending:
+        current = pending.pop()
+        if current in seen or current is get_user_model():
+            continue
+        seen.add(current)
+        for field in current._meta.get_fields(include_hidden=True):
+            if field.is_relation and field.related_model is not None:
+                pending.append(field.related_model)
+    return frozenset(seen)
+
+
+def invalidate_counts(user: Any, *models: type[models.Model]):
+    for model in models:
+        try:
+            cache.incr(generation_key(model, user))
+        except ValueError:
+            pass
+
+
+class CountInvalidationMiddleware:
+    # invalidates the cached counts of the models a root mutation writes,
+    # the model of form mutations or their `invalidates` attribute, and of
+    # the models whose lists depend on them
+    def resolve(self, next, root, info, **args):
+        result = next(root, info, **args)
+        if (
+            root is None
+            and info.operation.operation == OperationType.MUTATION
+            and getattr(info.context.user, "is_authenticated", False)
+        ):
+            mutation = getattr(get_named_type(info.return_type), "graphene_type", None)
+            targets = getattr(mutation, "invalidates", None) or [
+                getattr(getattr(mutation, "_meta", None), "model", None)
+            ]
+            invalidate_counts(
+                info.context.user,
+                *{m for t in targets if t is not None for m in dependents(t)},
+            )
+        return result
+
+
+def check_cache(app_configs: Any, **kwargs: Any):
+    # the generations of the counts are bumped by whichever worker process
+    # ran the mutation, a process-local cache keeps serving the counts the
+    # other processes invalidated until they expire
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend.endswith(".LocMemCache") and settings.LIST_COUNT_CACHE_TIMEOUT:
+        return [
+            checks.Warning(
+                "The cached list counts are not invalidated across processes.",
+                hint=(
+                    "Use a cache shared by the worker processes (e.g. redis) or"
+                    " set LIST_COUNT_CACHE_TIMEOUT to 0."
+                ),
+                id="utils.W001",
+            )
+        ]
+    return []
@@ -1,19 +1,38 @@
+from collections.abc import Callable, Mapping
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
 from typing import Any, TypeVar
 
+from django.core.exceptions import FieldDoesNotExist
 from django.db import models
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.constants import LOOKUP_SEP
 from django.forms import ModelForm
 from django_filters import FilterSet
-from graphene import Enum, InputObjectType
+from graphene import Enum, InputField, InputObjectType, List, NonNull
 from graphene_django.forms.mutation import fields_for_form
 
 T = TypeVar("T", bound=InputObjectType)
 T1 = TypeVar("T1", bound=Enum)
 
 
+# the names of the and/or/not operands in the filter inputs
+OPERATORS = ("and_", "or_", "not_")
+
+
 class FilterQueryInput(InputObjectType):
     filter_class: type[FilterSet] | None = None
 
+    @classmethod
+    def __init_subclass_with_meta__(cls, **options: Any):
+        # nested filters of the input type itself, set on every subclass so
+        # that the operands refer to the type that ends up in the schema
+        cls.and_ = List(NonNull(lambda: cls), name="and")
+        cls.or_ = List(NonNull(lambda: cls), name="or")
+        cls.not_ = InputField(lambda: cls, name="not")
+        super().__init_subclass_with_meta__(**options)
+
     @classmethod
     def filter(
         cls, queryset: models.QuerySet[Any], **filters: Any
@@ -21,22 +40,124 @@ class FilterQueryInput(InputObjectType):
         return cls.filter_class(filters, queryset).qs  # type: ignore
 
 
+def exact_number(field: str):
+    # numeric input matched exactly on an indexed integer column, e.g. in
+    # place of icontains which casts the column to text and scans the table
+    def rewrite(value: Any):
+        try:
+            return Q(**{field: int(str(value).strip())})
+        except ValueError:
+            return None
+
+    return rewrite
+
+
+def decimal_range(field: str):
+    # numeric input matches the numbers it is the leading part of, as a pair
+    # of ranges around zero instead of casting the column to text, e.g. "12"
+    # matches [12, 13) and the mirrored (-13, -12], and "-1.5" only (-1.6, -1.5]
+    def rewrite(value: Any):
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            return None
+        if not number.is_finite():
+            return None
+        step = Decimal(1).scaleb(min(int(number.as_tuple().exponent), 0))
+        low, high = abs(number), abs(number) + step
+        negative = Q(**{f"{field}__gt": -high, f"{field}__lte": -low})
+        if number.is_signed():
+            return negative
+        return Q(**{f"{field}__gte": low, f"{field}__lt": high}) | negative
+
+    return rewrite
+
+
+def sign(field: str, negative: Any, positive: Any):
+    # values derived from the sign of a numeric column, e.g. the operation of
+    # a transaction, compared on the column itself
+    def rewrite(value: Any):
+        if value == negative:
+            return Q(**{f"{field}__lt": 0})
+        elif value == positive:
+            return Q(**{f"{field}__gte": 0})
+        return None
+
+    return rewrite
+
+
+def relation_exists(model: type[models.Model], name: str, value: Any):
+    # lookups across a multi-valued relation (e.g. tag__name__icontains) as a
+    # correlated EXISTS on the related rows, joining them would repeat the row
+    # once per match and inflate the counts
+    parts = name.split(LOOKUP_SEP)
+    for i, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        if field.many_to_many or field.one_to_many:
+            related = field.related_model
+            rest = parts[i + 1 :]
+            try:
+                related._meta.get_field(rest[0])
+            except (IndexError, FieldDoesNotExist):
+                rest = ["pk", *rest]
+            outer = OuterRef(LOOKUP_SEP.join([*parts[:i], "pk"]))
+            return Q(
+                Exists(
+                    related._base_manager.filter(
+                        **{field.remote_field.name: outer},
+                        **{LOOKUP_SEP.join(rest): value},
+                    )
+                )
+            )
+        model = field.related_model
+    return None
+
+
 class OrFilterSet(FilterSet):
+    # filter names mapped to functions compiling their value into a native
+    # predicate, a None result falls back to the lookup of the filter name
+    rewrites: dict[str, Callable[[Any], Q | None]] = {}
+
     class Meta:
         abstract = True
 
+    def compile(self, name: str, value: Any):
+        rewrite = self.rewrites.get(name)
+        q = rewrite(value) if rewrite else None
+        if q is None:
+            q = relation_exists(self.queryset.model, name, value)
+        return Q(**{name: value}) if q is None else q
+
+    def expression(self, data: Mapping[str, Any]) -> Q:
+        # use or condition in chaining the lookups of a level, hence the '|'
+        # operator, the result is narrowed down by every "and" operand, any
+        # of the "or" operands and the negated "not" operand
+        lookups = [
+            self.compile(k, v)
+            for k, v in data.items()
+            if k not in OPERATORS and v is not None
+        ]
+        expr = reduce(or_, lookups) if lookups else Q()
+        for operand in data.get("and_") or ():
+            expr &= self.expression(operand)
+        operands = [self.expression(o) for o in data.get("or_") or ()]
+        # an empty operand matches every row and so does their union
+        if operands and all(operands):
+            expr &= reduce(or_, operands)
+        if data.get("not_") is not None:
+            expr &= ~self.expression(data["not_"])
+        return expr
+
     @property
     def qs(self):
         qs = self.queryset.all()
         if self.data:
-            expr = None
-            for k, v in self.data.items():
-                if v is None:
-                    continue
-                # use or condition in chaining the filters, hence the '|' operator
-                q = Q(**{k: v})
-                expr = q if expr is None else expr | q
-            qs = qs.filter(expr)
+            qs = qs.filter(self.expression(self.data))
         return qs
 
 
@@ -9,6 +9,11 @@ class Gql:
         return str(self)
 
 
+class GqlVariable(str):
+    # rendered as is instead of as a string literal, e.g. "$file"
+    pass
+
+
 Kwarg = str | int | tuple[Any, ...] | set[Any] | list[Any] | None
 
 
@@ -22,22 +27,31 @@ class GqlObject(Gql):
 
     @classmethod
     def to_key(cls, value: str):
-        return "".join(
-            map(
-                lambda e: (e[1][0].lower() if e[0] == 0 else e[1][0].upper())
-                + e[1][1:],
-                enumerate(value.split("_")),
-            )
+        # like graphene, the double underscore of lookups keeps one underscore
+        # e.g. amount__icontains becomes amount_Icontains
+        first, *rest = value.split("_")
+        return (
+            first[:1].lower()
+            + first[1:]
+            + "".join(part[0].upper() + part[1:] if part else "_" for part in rest)
         )
 
     @classmethod
     def to_value(cls, value: Any = ...):
         if value is Ellipsis:
             return ""
+        elif isinstance(value, GqlVariable):
+            return str(value)
         elif isinstance(value, str):
             return f'"{value}"'
         elif value is None:
             return "null"
+        elif isinstance(value, bool):
+            return str(value).lower()
+        elif isinstance(value, (list, tuple, set)):
+            return "[%s]" % ", ".join(map(cls.to_value, value))
+        elif isinstance(value, dict):
+            return str(GqlArgument(value))
         return str(value)
 
     @classmethod
@@ -49,7 +63,10 @@ class GqlObject(Gql):
             if not tvalue
             else (
                 f"{key} {tvalue}"
-                if isinstance(value, cls) and not value.kwargs
+                # selection sets never take a colon, arguments only do when
+                # they hold nested values
+                if isinstance(value, GqlType)
+                or (isinstance(value, cls) and not value.kwargs)
                 else f"{key}: {tvalue}"
             )
         )
@@ -132,7 +149,9 @@ class GqlAction(Gql):
         arg = str(self.argument)[2:-2]
         if arg:
             fmt += f"(\n{arg}\n)"
-        fmt += " " + str(self.type)
+        # scalar fields have no selection set
+        if self.type.args or self.type.kwargs:
+            fmt += " " + str(self.type)
         return fmt
 
     def __repr__(self):
@@ -0,0 +1,80 @@
+from functools import cache
+from typing import Any
+
+from django.db import models
+from django.db.models import prefetch_related_objects
+from graphene.utils.str_converters import to_snake_case
+
+
+@cache
+def relations(model: type[models.Model]) -> dict[str, Any]:
+    # the forward and reverse relations of the model by their attribute name
+    return {
+        (f.get_accessor_name() if f.auto_created and not f.concrete else f.name): f
+        for f in model._meta.get_fields()
+        if f.is_relation
+    }
+
+
+def is_loaded(row: models.Model, field: Any):
+    if field.many_to_many:
+        # reverse many to many relations are prefetched under their query name
+        name = field.name if field.concrete else field.field.related_query_name()
+        return name in getattr(row, "_prefetched_objects_cache", {})
+    if field.one_to_many:
+        return field.get_cache_name() in getattr(row, "_prefetched_objects_cache", {})
+    return field.is_cached(row)
+
+
+class Loader:
+    # per request batches of sibling rows, e.g. the transactions of a listed
+    # page. The first relation resolved on any row of a batch is loaded for
+    # the whole batch with one IN query, and the loaded rows form the batch
+    # of the next level.
+    def __init__(self):
+        self.batches: dict[int, list[models.Model]] = {}
+
+    def register(self, rows: Any):
+        batch = [r for r in rows if isinstance(r, models.Model)]
+        for row in batch:
+            self.batches.setdefault(id(row), batch)
+        return rows
+
+    def load(self, row: models.Model, name: str):
+        field = relations(type(row)).get(name)
+        if field is None or is_loaded(row, field):
+            return
+        batch = [
+            r
+            for r in self.batches.get(id(row), [row])
+            if type(r) is type(row) and not is_loaded(r, field)
+        ]
+        prefetch_related_objects(batch, name)
+
+        loaded: dict[int, models.Model] = {}
+        for r in batch:
+            if field.many_to_many or field.one_to_many:
+                values = list(getattr(r, name).all())
+            else:
+                values = [getattr(r, name, None)]
+            loaded.update((id(v), v) for v in values if v is not None)
+        self.register(loaded.values())
+
+    @classmethod
+    def get(cls, info: Any) -> "Loader":
+        # attached to the request so that every schema shares the batches
+        loader = getattr(info.context, "loader", None)
+        if loader is None:
+            loader = info.context.loader = cls()
+        return loader
+
+
+class LoaderMiddleware:
+    def resolve(self, next, root, info, **args):
+        if isinstance(root, models.Model):
+            Loader.get(info).load(root, to_snake_case(info.field_name))
+        result = next(root, info, **args)
+        # lists of rows, like the data of the list payloads, become batches
+        if isinstance(result, (list, models.QuerySet)):
+            Loader.get(info).register(result)
+        return result
@@ -0,0 +1,212 @@
+import bisect
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import Any
+
+# upper bounds of the buckets of the durations in seconds and of the counts
+SECONDS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.0075,
+    0.01,
+    0.015,
+    0.025,
+    0.04,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.25,
+    0.4,
+    0.5,
+    0.75,
+    1,
+    2.5,
+    5,
+    10,
+)
+COUNTS = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100, 200, 500, 1000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = tuple[tuple[str, Any], ...]
+
+
+# shards of every counter and histogram, a thread always writes to the same
+# one and takes the lock of that shard only, so that the threads of the wsgi
+# worker seldom wait on each other while the memory stays bounded
+SHARDS = 16
+threads = threading.local()
+thread_count = itertools.count()
+
+
+def shard_index():
+    index = getattr(threads, "shard", None)
+    if index is None:
+        index = threads.shard = next(thread_count) % SHARDS
+    return index
+
+
+class Sharded(ABC):
+    # the reads add the shards up
+    def __init__(self):
+        self.shards = [self.new_shard() for _ in range(SHARDS)]
+        self.locks = [threading.Lock() for _ in range(SHARDS)]
+
+    @abstractmethod
+    def new_shard(self) -> list[Any]:
+        # the zeroed values of one shard
+        ...
+
+
+class Counter(Sharded):
+    def new_shard(self):
+        return [0.0]
+
+    def inc(self, amount: float = 1):
+        index = shard_index()
+        with self.locks[index]:
+            self.shards[index][0] += amount
+
+    @property
+    def value(self):
+        return sum(s[0] for s in self.shards)
+
+
+class Histogram(Sharded):
+    # the number of observations at most each bucket bound, the last bucket
+    # counts the ones past every bound, and the sum of the observations
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        super().__init__()
+
+    def new_shard(self):
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float):
+        bucket = bisect.bisect_left(self.buckets, value)
+        index = shard_index()
+        with self.locks[index]:
+            shard = self.shards[index]
+            shard[bucket] += 1
+            shard[-1] += value
+
+    @property
+    def counts(self) -> list[int]:
+        return [sum(s[i] for s in self.shards) for i in range(len(self.buckets) + 1)]
+
+    @property
+    def sum(self) -> float:
+        return sum(s[-1] for s in self.shards)
+
+    def quantile(self, q: float, counts: list[int] | None = None):
+        # interpolated within the bucket holding it, like prometheus does,
+        # the ones past every bound are reported as the largest bound
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts[:-1]):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def format_labels(labels: Labels, **extra: Any):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_value(value: float):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Registry:
+    # the counters and histograms of the process by name and labels, and the
+    # gauges computed from them when rendered, every worker process of the
+    # server has a registry of its own
+    def __init__(self):
+        self.counters: dict[str, dict[Labels, Counter]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.gauges: dict[str, Callable[[], dict[Labels, float]]] = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, **labels: Any) -> Counter:
+        key = tuple(sorted(labels.items()))
+        counter = self.counters.get(name, {}).get(key)
+        if counter is None:
+            with self.lock:
+                series = self.counters.setdefault(name, {})
+                counter = series.setdefault(key, Counter())
+        return counter
+
+    def histogram(self, name: str, buckets: tuple[float, ...], **labels: Any):
+        key = tuple(sorted(labels.items()))
+        histogram = self.histograms.get(name, {}).get(key)
+        if histogram is None:
+            with self.lock:
+                series = self.histograms.setdefault(name, {})
+                histogram = series.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def gauge(self, name: str, func: Callable[[], dict[Labels, float]]):
+        self.gauges[name] = func
+
+    def render(self):
+        # the prometheus text exposition format, the histograms come with
+        # their p50/p95/p99 estimates as <name>_quantile gauges
+        lines = []
+        with self.lock:
+            counters = {n: dict(s) for n, s in self.counters.items()}
+            histograms = {n: dict(s) for n, s in self.histograms.items()}
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(func().items()):
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        for name, series in sorted(counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for labels, counter in sorted(series.items()):
+                lines.append(
+                    f"{name}{format_labels(labels)} {format_value(counter.value)}"
+                )
+        for name, series in sorted(histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            quantiles = []
+            for labels, histogram in sorted(series.items()):
+                counts = histogram.counts
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, float("inf")), counts):
+                    cumulative += count
+                    le = format_labels(labels, le=format_value(bound))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(
+                    f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}"
+                )
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+                for q in QUANTILES:
+                    value = histogram.quantile(q, counts)
+                    if value is not None:
+                        quantile = format_labels(labels, quantile=q)
+                        quantiles.append(
+                            f"{name}_quantile{quantile} {format_value(value)}"
+                        )
+            if quantiles:
+                lines.append(f"# TYPE {name}_quantile gauge")
+                lines += quantiles
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
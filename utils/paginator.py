@@ -1,7 +1,17 @@
-from typing import Any, Iterable
+import base64
+import datetime
+import json
+import math
+from typing import Any, Callable, Iterable
 
-from django.core.paginator import Paginator
-from graphene import Field, InputObjectType, Int, ObjectType
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from graphene import Field, InputObjectType, Int, ObjectType, String
+
+from utils.counts import count
 
 
 def set_values(input_object: InputObjectType):
@@ -27,34 +37,176 @@ class PaginatorType(ObjectType):
     items = Int(default_value=0, required=True)
     pages = Int(default_value=1, required=True)
     page = Field(PageType, required=True)
+    # opaque cursors of the pages following and preceding this one, to go on
+    # in the cursor mode
+    after = String()
+    before = String()
+
+
+class CursorPaginatorType(ObjectType):
+    # the cursor mode has no counts nor page numbers
+    per_page = Int(default_value=1, required=True)
+    after = String()
+    before = String()
+
+
+def order_keys(queryset: models.QuerySet[Any]):
+    # (field, descending) pairs of the active ordering, the primary key is
+    # appended to break ties so that every row has a distinct position
+    opts = queryset.model._meta
+    ordering = list(queryset.query.order_by or opts.ordering or ["pk"])
+    keys: list[tuple[models.Field, bool]] = []
+    for o in ordering:
+        if not isinstance(o, str) or "__" in o or o.lstrip("-") == "?":
+            raise ValueError("Cursors only support ordering by the model fields.")
+        name = o.lstrip("-")
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError("Cursors only support ordering by the model fields.")
+        keys.append((field, o.startswith("-")))
+    if all(f != opts.pk for f, _ in keys):
+        keys.append((opts.pk, False))
+    return keys
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o: Any):
+        # keeps the microseconds the default encoder drops
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(keys: list[tuple[models.Field, bool]], row: Any):
+    values = [getattr(row, field.attname) for field, _ in keys]
+    value = json.dumps(values, cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(value).decode()
+
+
+def decode_cursor(keys: list[tuple[models.Field, bool]], cursor: str):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        assert isinstance(values, list) and len(values) == len(keys)
+        return [field.to_python(v) for (field, _), v in zip(keys, values)]
+    except Exception:
+        raise ValueError("The cursor is invalid.")
+
+
+def keyset(keys: list[tuple[models.Field, bool]], values: list[Any], backward: bool):
+    # rows strictly after the cursor in the ordering, or before it going
+    # backward: (a > x) or (a = x and b > y) or ...
+    expr = None
+    equal: dict[str, Any] = {}
+    for (field, descending), value in zip(keys, values):
+        lookup = "lt" if descending != backward else "gt"
+        q = Q(**equal, **{f"{field.attname}__{lookup}": value})
+        expr = q if expr is None else expr | q
+        equal[field.attname] = value
+    return expr
+
+
+def cursors(objects: Any, rows: Any, has_next: bool, has_previous: bool):
+    # lets the client continue in the cursor mode from any page
+    kwargs: dict[str, Any] = {}
+    if isinstance(objects, models.QuerySet) and len(rows):
+        try:
+            keys = order_keys(objects)
+        except ValueError:
+            # e.g. ordered by an annotation, only paginated by page numbers
+            return kwargs
+        if has_next:
+            kwargs["after"] = encode_cursor(keys, rows[len(rows) - 1])
+        if has_previous:
+            kwargs["before"] = encode_cursor(keys, rows[0])
+    return kwargs
+
+
+def total(objects: Iterable[Any], counter: Callable[[Any], int] = count):
+    if isinstance(objects, models.QuerySet):
+        return counter(objects)
+    return len(objects)  # type: ignore
 
 
 class PaginatorQueryInput(InputObjectType):
     per_page = Int(default_value=10)
     page = Int(default_value=1)
+    # switches to the cursor mode, an empty cursor starts from the first row
+    after = String(default_value=None)
+    before = String(default_value=None)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         set_values(self, **kwargs)
 
-    def paginate(self, objects: Iterable[Any]):
-        paginator = Paginator(objects, max(self.per_page, 1))  # type: ignore
-        page = paginator.get_page(min(max(self.page, 1), paginator.num_pages))  # type: ignore
-        kwargs = dict(
-            per_page=paginator.per_page,
-            items=paginator.count,
-            pages=paginator.num_pages,
-            page=PageType(),
+    def get_per_page(self) -> int:
+        # capped so that a single page cannot load the whole table
+        return min(max(self.per_page, 1), settings.PAGINATOR_MAX_PER_PAGE)  # type: ignore
+
+    def paginate(
+        self,
+        objects: Iterable[Any],
+        counter: Callable[[models.QuerySet[Any]], int] | None = count,
+    ):
+        # the page is always sliced from the live rows, one row past it tells
+        # whether there is a next one, and a page past the last one falls back
+        # to the last one. The counter (possibly cached) only reports the
+        # items and pages, which are left out without one.
+        if self.after is not None or self.before is not None:
+            return self.paginate_cursor(objects)  # type: ignore
+        per_page = self.get_per_page()
+        number = max(self.page, 1)  # type: ignore
+        rows, more = self.slice(objects, number, per_page)
+        if not rows and number > 1:
+            # counted live, a cached count may be stale
+            number = max(math.ceil(total(objects) / per_page), 1)
+            rows, more = self.slice(objects, number, per_page)
+        page = PageType(
+            previous=number - 1 if number > 1 else None,
+            current=number,
+            next=number + 1 if more else None,
         )
-        pkwargs = dict(
-            previous=page.previous_page_number() if page.has_previous() else None,
-            current=page.number,
-            next=page.next_page_number() if page.has_next() else None,
+        kwargs = cursors(objects, rows, more, number > 1)
+        if counter is not None:
+            items = total(objects, counter)
+            kwargs.update(items=items, pages=max(math.ceil(items / per_page), 1))
+        return rows, PaginatorType(per_page=per_page, page=page, **kwargs)
+
+    @staticmethod
+    def slice(objects: Iterable[Any], number: int, per_page: int):
+        start = (number - 1) * per_page
+        rows = list(objects[start : start + per_page + 1])  # type: ignore
+        return rows[:per_page], len(rows) > per_page
+
+    def paginate_cursor(self, objects: models.QuerySet[Any]):
+        # seeks to the cursor instead of counting and offsetting, deep pages
+        # cost the same as the first one
+        per_page = self.get_per_page()
+        keys = order_keys(objects)
+        backward = self.before is not None
+        cursor = self.before if backward else self.after
+        objects = objects.order_by(
+            *(("-" if desc != backward else "") + f.attname for f, desc in keys)
         )
-        kwargs["page"] = PageType(**pkwargs)
-        paginator_type = PaginatorType(**kwargs)
-        return page.object_list, paginator_type
+        if cursor:
+            objects = objects.filter(
+                keyset(keys, decode_cursor(keys, cursor), backward)
+            )
+        rows = list(objects[: per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backward:
+            rows.reverse()
+
+        # coming from a cursor means there are rows on its other side
+        has_next = bool(cursor) if backward else more
+        has_previous = more if backward else bool(cursor)
+        kwargs = cursors(objects, rows, has_next, has_previous)
+        return rows, CursorPaginatorType(per_page=per_page, **kwargs)
 
 
 class PaginatorQueryPayload(ObjectType):
+    # the paginator of the pages by number or the cursor of the cursor mode,
+    # the other one is null
     paginator = Field(PaginatorType)
+    cursor = Field(CursorPaginatorType)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import HttpError
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute_sync,
+    get_operation_ast,
+    parse,
+    specified_rules,
+    validate,
+)
+
+from utils.cost import CostRule, database_deadline
+from utils.timing import Timing
+from utils.upload import UploadGraphQLView
+
+
+def digest(query: str):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class DocumentCache:
+    # the parsed and validated documents of the most recently used queries by
+    # the sha256 of their text, the least recently used ones are evicted
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: OrderedDict[str, Any] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: Any):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+@cache
+def allow_list() -> dict[str, str]:
+    # the {id: query} JSON file written when building the clients, the sha256
+    # of a query text is accepted as its id as well
+    path = getattr(settings, "GRAPHQL_PERSISTED_QUERIES", None)
+    if not path or not Path(path).exists():
+        return {}
+    queries: dict[str, str] = json.loads(Path(path).read_text())
+    return {**{digest(q): q for q in queries.values()}, **queries}
+
+
+class PersistedGraphQLView(UploadGraphQLView):
+    # accepts the id of a persisted query, as the `id` parameter or the
+    # sha256Hash of the persistedQuery extension, in place of its text and
+    # skips parsing and validating the queries it has seen recently
+    documents = DocumentCache(getattr(settings, "GRAPHQL_DOCUMENT_CACHE_SIZE", 256))
+
+    def get_query(self, request, data: dict[str, Any], query: str | None):
+        extensions = request.GET.get("extensions") or data.get("extensions") or {}
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted = extensions.get("persistedQuery") or {}
+        key = request.GET.get("id") or data.get("id") or persisted.get("sha256Hash")
+        only = getattr(settings, "GRAPHQL_PERSISTED_QUERIES_ONLY", False)
+        if key is None:
+            if query and only:
+                raise GraphQLError("Only persisted queries are allowed.")
+            return query
+        if key in allow_list():
+            return allow_list()[key]
+        if not only:
+            # automatic persisted queries, the text sent along registers it
+            if query:
+                if digest(query) != key:
+                    raise GraphQLError("The query does not match its hash.")
+                return query
+            entry = self.documents.get(key)
+            if entry is not None:
+                return entry[0]
+        raise GraphQLError(
+            "PersistedQueryNotFound",
+            extensions=dict(code="PERSISTED_QUERY_NOT_FOUND"),
+        )
+
+    def get_document(self, query: str) -> tuple[DocumentNode | None, list[Any]]:
+        key = digest(query)
+        entry = self.documents.get(key)
+        if entry is None:
+            try:
+                document = parse(query)
+            except GraphQLError as e:
+                return None, [e]
+            errors = validate(
+                self.schema.graphql_schema, document, (*specified_rules, CostRule)
+            )
+            entry = (query, document, errors)
+            self.documents.put(key, entry)
+        return entry[1], entry[2]
+
+    def execute_graphql_request(self, request, *args, **kwargs):
+        # the database queries of a request are interrupted once it took
+        # GRAPHQL_DATABASE_DEADLINE seconds, its resolvers are timed by the
+        # TimingMiddleware and returned as extensions.timing when the request
+        # has the GRAPHQL_TIMING_HEADER
+        header = getattr(settings, "GRAPHQL_TIMING_HEADER", None)
+        detailed = bool(header and request.headers.get(header))
+        request.timing = Timing(detailed)
+        deadline = getattr(settings, "GRAPHQL_DATABASE_DEADLINE", None)
+        with database_deadline(deadline), connection.execute_wrapper(request.timing):
+            result = self.execute_document(request, *args, **kwargs)
+        if result is not None:
+            request.timing.finish(bool(result.errors))
+        if detailed:
+            request.extensions = dict(timing=request.timing.as_dict())
+        return result
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = getattr(request, "extensions", None)
+        if extensions:
+            d = {**d, "extensions": extensions}
+        return super().json_encode(request, d, pretty)
+
+    def execute_document(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        # GraphQLView.execute_graphql_request, executing the cached document
+        # instead of parsing and validating the query text again
+        try:
+            query = self.get_query(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        document, errors = self.get_document(query)
+        if errors:
+            return ExecutionResult(errors=errors)
+        operation_ast = get_operation_ast(document, operation_name)  # type: ignore[arg-type]
+
+        if request.method.lower() == "get":
+            if operation_ast and operation_ast.operation != OperationType.QUERY:
+                if show_graphiql:
+                    return None
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["POST"],
+                        "Can only perform a {} operation from a POST request.".format(
+                            operation_ast.operation.value
+                        ),
+                    )
+                )
+        try:
+            options = dict(
+                schema=self.schema.graphql_schema,
+                document=document,
+                root_value=self.get_root_value(request),
+                variable_values=variables,
+                operation_name=operation_name,
+                context_value=self.get_context(request),
+                middleware=self.get_middleware(request),
+            )
+            if self.execution_context_class:
+                options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute_sync(**options)  # type: ignore[arg-type]
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute_sync(**options)  # type: ignore[arg-type]
+        except Exception as e:
+            return ExecutionResult(errors=[e])
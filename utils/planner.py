@@ -0,0 +1,109 @@
+from typing import Any
+
+from django.db import models
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+
+from utils.loaders import relations
+from utils.selection import path_nodes, selection_fields
+
+
+class Plan:
+    # the columns, joins and prefetches a selection set needs from a model,
+    # `complete` is false once a selected field is not backed by the model
+    # (e.g. a custom resolver) and then every column has to be loaded
+    def __init__(self):
+        self.only: set[str] = set()
+        self.select_related: set[str] = set()
+        self.prefetches: list[Prefetch] = []
+        self.annotations: set[str] = set()
+        self.complete = True
+
+
+def concrete_fields(model: type[models.Model]):
+    return {f.name: f for f in model._meta.concrete_fields}
+
+
+def plan_model(
+    info: Any,
+    model: type[models.Model],
+    nodes: list[Any],
+    annotations: set[str] = set(),
+    prefix: str = "",
+    plan: Plan | None = None,
+):
+    plan = plan or Plan()
+    columns = {model._meta.pk.name}
+    complete = True
+    for node in (f for n in nodes for f in selection_fields(info, n.selection_set)):
+        if node.name.value == "__typename":
+            continue
+        name = to_snake_case(node.name.value)
+        field = relations(model).get(name) or concrete_fields(model).get(name)
+        if name in getattr(model, "derived_fields", {}):
+            # computed from columns of the row, e.g. the operation, even when
+            # a column has the name of the field
+            columns |= set(model.derived_fields[name])  # type: ignore[attr-defined]
+        elif field is None:
+            # annotations named computed_<field> back the field of that name
+            matches = {name, f"computed_{name}"} & annotations
+            plan.annotations |= matches
+            complete = complete and bool(matches)
+        elif not field.is_relation:
+            columns.add(name)
+        elif field.concrete and (field.many_to_one or field.one_to_one):
+            columns.add(name)
+            plan.select_related.add(prefix + name)
+            plan_model(
+                info, field.related_model, [node], prefix=f"{prefix}{name}__", plan=plan
+            )
+        else:
+            related = field.related_model
+            queryset = related._default_manager.all()
+            nested = plan_model(info, related, [node])
+            if field.one_to_many:
+                # the prefetched rows are matched on their foreign key
+                nested.only.add(field.field.name)
+            plan.prefetches.append(
+                Prefetch(prefix + name, queryset=apply_plan(queryset, nested))
+            )
+    if complete:
+        plan.only |= {prefix + c for c in columns}
+    elif not prefix:
+        plan.complete = False
+    return plan
+
+
+def apply_plan(queryset: models.QuerySet[Any], plan: Plan):
+    if plan.select_related:
+        queryset = queryset.select_related(*sorted(plan.select_related))
+    if plan.prefetches:
+        queryset = queryset.prefetch_related(*plan.prefetches)
+    if plan.complete:
+        queryset = queryset.only(*sorted(plan.only))
+    return queryset
+
+
+def plan(queryset: models.QuerySet[Any], info: Any, *path: str):
+    # applies the joins, prefetches and column list the rows at the path of
+    # the resolved field (e.g. "data" of the payloads) are queried with, the
+    # annotations no selected field reads are left out of the select list
+    if info is None:
+        return queryset
+    nodes = path_nodes(info, *(path or ("data",)))
+    if not nodes:
+        return queryset
+    annotations = set(queryset.query.annotations)
+    result = plan_model(info, queryset.model, nodes, annotations)
+    # the ordering columns are read back for the pagination cursors
+    result.only |= {
+        o.lstrip("-")
+        for o in queryset.query.order_by
+        if isinstance(o, str)
+        and o.lstrip("-") in {"pk", *concrete_fields(queryset.model)}
+    }
+    queryset = apply_plan(queryset, result)
+    if annotations:
+        queryset = queryset.all()
+        queryset.query.set_annotation_mask(result.annotations)
+    return queryset
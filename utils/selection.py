@@ -0,0 +1,34 @@
+from typing import Any
+
+from graphql import FieldNode, FragmentSpreadNode, InlineFragmentNode, SelectionSetNode
+
+
+def selection_fields(info: Any, selection_set: SelectionSetNode | None):
+    # the field nodes of a selection set with the fragments spread out
+    for node in selection_set.selections if selection_set else ():
+        if isinstance(node, FieldNode):
+            yield node
+        elif isinstance(node, InlineFragmentNode):
+            yield from selection_fields(info, node.selection_set)
+        elif isinstance(node, FragmentSpreadNode):
+            fragment = info.fragments[node.name.value]
+            yield from selection_fields(info, fragment.selection_set)
+
+
+def path_nodes(info: Any, *path: str):
+    # the field nodes at the (camel cased) path below the resolved field
+    nodes = list(info.field_nodes)
+    for name in path:
+        nodes = [
+            field
+            for node in nodes
+            for field in selection_fields(info, node.selection_set)
+            if field.name.value == name
+        ]
+    return nodes
+
+
+def selects(info: Any, *path: str):
+    # whether the field at the path is part of the query, e.g.
+    # selects(info, "paginator", "items")
+    return info is None or bool(path_nodes(info, *path))
@@ -0,0 +1,133 @@
+import time
+from functools import cache
+from typing import Any
+
+from graphql import FieldNode, OperationDefinitionNode, get_named_type, is_leaf_type
+
+from utils.metrics import COUNTS, SECONDS, registry
+
+
+def operation_name(operation: OperationDefinitionNode):
+    # the root fields of the operation, e.g. "listTransactions", unlike the
+    # names the clients give the operations they are bounded by the schema
+    fields = (s for s in operation.selection_set.selections if isinstance(s, FieldNode))
+    return ",".join(sorted({f.name.value for f in fields})) or "fragments"
+
+
+def error_ratios():
+    # the share of the requests of each operation that returned errors
+    requests = dict(registry.counters.get("graphql_requests_total", {}))
+    errors = dict(registry.counters.get("graphql_errors_total", {}))
+    return {
+        labels: (errors[labels].value if labels in errors else 0) / counter.value
+        for labels, counter in requests.items()
+        if counter.value
+    }
+
+
+registry.gauge("graphql_error_ratio", error_ratios)
+
+
+class Timing:
+    # the wall time, sql query count and sql time of a request and of each of
+    # its resolvers by "Type.field", the queries count toward the resolver
+    # running them, e.g. a batch of the loaders toward the first row's field
+    def __init__(self, detailed: bool = False):
+        self.detailed = detailed
+        self.operation: str | None = None
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.fields: dict[str, list[Any]] = {}
+        self.current: list[Any] | None = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # the connection.execute_wrapper of the request
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql += elapsed
+            if self.current is not None:
+                self.current[2] += 1
+                self.current[3] += elapsed
+
+    def finish(self, errors: bool = False):
+        # observed by the process metrics under the operation name
+        self.duration = time.perf_counter() - self.start
+        operation = self.operation or "invalid"
+        registry.counter("graphql_requests_total", operation=operation).inc()
+        if errors:
+            registry.counter("graphql_errors_total", operation=operation).inc()
+        registry.histogram(
+            "graphql_request_seconds", SECONDS, operation=operation
+        ).observe(self.duration)
+        registry.histogram("graphql_sql_queries", COUNTS, operation=operation).observe(
+            self.queries
+        )
+        registry.histogram("graphql_sql_seconds", SECONDS, operation=operation).observe(
+            self.sql
+        )
+        for field, (_, seconds, queries, _) in self.fields.items():
+            registry.histogram(
+                "graphql_resolver_seconds", SECONDS, operation=operation, field=field
+            ).observe(seconds)
+            registry.histogram(
+                "graphql_resolver_sql_queries",
+                COUNTS,
+                operation=operation,
+                field=field,
+            ).observe(queries)
+
+    def as_dict(self):
+        # the extensions.timing payload, in milliseconds
+        def ms(seconds: float):
+            return round(seconds * 1000, 3)
+
+        return dict(
+            operation=self.operation,
+            duration=ms(self.duration),
+            queries=self.queries,
+            sql=ms(self.sql),
+            resolvers={
+                field: dict(
+                    calls=calls, duration=ms(seconds), queries=queries, sql=ms(sql)
+                )
+                for field, (calls, seconds, queries, sql) in self.fields.items()
+            },
+        )
+
+
+@cache
+def is_leaf(type_: Any):
+    return is_leaf_type(get_named_type(type_))
+
+
+class TimingMiddleware:
+    # times the resolvers of the requests the graphql view attached a Timing
+    # to, as `timing` of the context. Only the fields of objects, which run
+    # the queries, are timed unless the whole breakdown was asked for, the
+    # scalars of every row would otherwise double the cost of the timing.
+    def resolve(self, next, root, info, **args):
+        timing: Timing | None = getattr(info.context, "timing", None)
+        if timing is None:
+            return next(root, info, **args)
+        if timing.operation is None:
+            timing.operation = operation_name(info.operation)
+        if not timing.detailed and is_leaf(info.return_type):
+            return next(root, info, **args)
+        key = f"{info.parent_type.name}.{info.field_name}"
+        stats = timing.fields.get(key)
+        if stats is None:
+            stats = timing.fields[key] = [0, 0.0, 0, 0.0]
+        previous, timing.current = timing.current, stats
+        start = time.perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+            timing.current = previous
@@ -0,0 +1,54 @@
+import json
+from typing import Any
+
+from django.http import HttpResponseBadRequest
+from graphene import Scalar
+from graphene_django.views import GraphQLView, HttpError
+
+
+class Upload(Scalar):
+    # the uploaded file is placed into the variables by UploadGraphQLView,
+    # it can never be written inline in the query and is only serialized
+    # back as its file name
+    @staticmethod
+    def serialize(value: Any):
+        return getattr(value, "name", None)
+
+    @staticmethod
+    def parse_literal(node, _variables=None):
+        return None
+
+    @staticmethod
+    def parse_value(value: Any):
+        return value
+
+
+class UploadGraphQLView(GraphQLView):
+    # follows the GraphQL multipart request specification: an `operations`
+    # field with the usual JSON body, a `map` field from the file fields to
+    # the variable paths they fill, and the files themselves
+    def parse_body(self, request):
+        if (
+            self.get_content_type(request) != "multipart/form-data"
+            or "operations" not in request.POST
+        ):
+            return super().parse_body(request)
+        try:
+            operations = json.loads(request.POST["operations"])
+            files = json.loads(request.POST.get("map", "{}"))
+            for key, paths in files.items():
+                for path in paths:
+                    self.place_file(operations, path, request.FILES[key])
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise HttpError(
+                HttpResponseBadRequest("Invalid multipart GraphQL request.")
+            )
+        return operations
+
+    @classmethod
+    def place_file(cls, operations: Any, path: str, file: Any):
+        *keys, last = path.split(".")
+        target = operations
+        for key in keys:
+            target = target[int(key) if isinstance(target, list) else key]
+        target[int(last) if isinstance(target, list) else last] = file